@@ -1,16 +1,45 @@
-from requests import request
-from typing import List
-from urllib.parse import urlparse  # For validating URLs
-from PIL import Image, ImageOps
+from requests import Session
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout as RequestsTimeout
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from http.client import HTTPConnection, HTTPException
+import asyncio
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager
+from enum import Enum
 import datetime
+import time
+from time import time as _now # setAlarm and setTimer have a parameter called time, which hides the time module
 import base64
-import hashlib
+import copy
 from io import BytesIO
 import math 
+import mmap
+import os
 import json
-from Crypto.Cipher import AES
-from struct import unpack # For reading multiple bytes, and unpacking them into variables
-import lzo
+import re
+import select
+import warnings
+from weakref import WeakKeyDictionary
+from operator import index, itemgetter
+from struct import Struct # For reading multiple bytes, and unpacking them into variables
+
+# orjson is a lot faster than the built-in json module when sending big payloads (like GIF frames),
+# but it's optional, so fall back to json if it's not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pybase64 uses SIMD instructions to encode base64 a lot faster than the built-in base64 module,
+# which helps when sending GIF frames, but it's optional, so fall back to base64 if it's not installed
+try:
+    import pybase64
+except ImportError:
+    pybase64 = None
 
 # Import our enums and such so that you can easily use them in the same class
 from pixooapi.types import *
@@ -24,9 +53,208 @@ user: dict | DivoomUser = None
 # A list of alarms set on the device
 alarms: list[Alarm] = []
 
+# Every device findDevices() has seen, keyed by IP address
+_devicesByIP: dict[str, dict] = {}
+
+# How long (in seconds) findDevices() reuses the list of devices before asking the online API again
+devicesTTL = 300
+
+# The last result of findDevices(), and when it was fetched
+_devicesCache = {"ts": 0.0, "data": None}
+
 # If true, no calls are actually made, but are printed instead.
 debug = False
 
+# How long (in seconds) to wait for the device or the online API to respond
+timeout = 5
+
+# How long (in seconds) to wait to connect to the device or the online API. If the device is off,
+# this is how long it takes to find out, so it's shorter than timeout
+connectTimeout = 2
+
+# If true, setters like setBrightness read the setting back from the device after changing it, instead of trusting
+# the device's acknowledgement. Can be overridden per call with verify=
+verifyWrites = False
+
+# How long (in seconds) the result of getSettings() is reused before asking the device again
+settingsTTL = 1.0
+
+# The last result of getSettings(), which device it came from, and when it was fetched
+_settingsCache = {"ip": None, "ts": 0.0, "data": None}
+
+# Held while getSettings() is asking the device, so that threads calling it at the same time share one request
+_settingsLock = threading.Lock()
+
+# How long (in seconds) divoomLogin() reuses a login for the same email and password
+loginTTL = 3600
+
+# If set to a path (e.g. ~/.cache/pixoo_api/state.json), divoomLogin() also keeps its logins in this file, so that
+# the next time your script runs it doesn't need to log in again. The file holds your login token, so it's off by default
+stateFile: str | None = None
+
+# Logins from divoomLogin(), keyed by (email, hashed password): (when we logged in, the user)
+_loginCache: dict[tuple[str, str], tuple[float, DivoomUser]] = {}
+
+# Results of getters that are served stale-while-revalidate (see _swr), keyed by (getter, device IP): (when it was fetched, the result)
+_swrCache: dict[tuple, tuple[float, object]] = {}
+
+# Keys in _swrCache that are being refreshed in the background right now
+_swrRefreshing: set[tuple] = set()
+_swrLock = threading.Lock()
+
+# How long (in seconds) getNightMode() reuses the schedule before asking the online API again
+nightModeTTL = 5.0
+
+# The last schedule getNightMode() got from the online API, which device it was for, and when it was fetched
+_nightModeCache = {"ip": None, "ts": 0.0, "data": None}
+
+# The last schedule setNightMode() sent, what it returned and when it was sent: (device IP and schedule, result, time)
+_lastNightMode: tuple | None = None
+
+# Commands held back by batch() on this thread. See batch()
+_batchState = threading.local()
+
+# Online commands that batch() can hold back, because nothing uses what the API sends back for them
+_batchableOnlineCommands = ("Sys/SetConf", "Tools/SetScoreBoard", "Channel/SetNightView", "Alarm/Del", "Alarm/DelAll")
+
+# Of those, the ones that change a setting, so a later change to the same setting in a batch replaces an earlier one.
+# Everything else (like deleting an alarm) is sent every time it was called
+_replaceableOnlineCommands = ("Sys/SetConf", "Tools/SetScoreBoard", "Channel/SetNightView")
+
+# Device commands that batch() never holds back. Draw/CommandList can't contain GIF frames (see NOTES.md),
+# and a heartbeat is only useful if it's sent straight away. Commands that get something (/Get) are never held back either
+_unbatchableCommands = ("Device/Hearbeat", "Draw/CommandList", "Draw/SendHttpGif")
+
+# Encoded bodies for commands that don't have any parameters, keyed by command. See _encodeJSON()
+_encodedCommands: dict[str, bytes] = {}
+
+# Encoded bodies for commands that get sent a lot and only have one int parameter, keyed by command: (parameter, body with a %d for the value). See _encodeJSON()
+_commandTemplates: dict[str, tuple[str, bytes]] = {
+    "Channel/SetBrightness": ("Brightness", b'{"Command":"Channel/SetBrightness","Brightness":%d}'),
+    "Channel/SetIndex": ("SelectIndex", b'{"Command":"Channel/SetIndex","SelectIndex":%d}'),
+    "Channel/OnOffScreen": ("OnOff", b'{"Command":"Channel/OnOffScreen","OnOff":%d}'),
+    "Channel/SetEqPosition": ("EqPosition", b'{"Command":"Channel/SetEqPosition","EqPosition":%d}'),
+    "Device/SetMirrorMode": ("Mode", b'{"Command":"Device/SetMirrorMode","Mode":%d}'),
+    "Device/SetScreenRotationAngle": ("Mode", b'{"Command":"Device/SetScreenRotationAngle","Mode":%d}')
+}
+
+# How many local files sendGIF() keeps the converted frames for, so sending the same file again doesn't convert it again
+frameCacheSize = 16
+
+# Frames converted from local files, keyed by (filename, when it was modified, file size, gamma). The least recently used are dropped first
+_frameCache: OrderedDict[tuple, list[GIFData]] = OrderedDict()
+
+# Gamma correction lookup tables, keyed by gamma value. See _gammaTable()
+_gammaTables: dict[float, list[int]] = {}
+
+# URLs that have already been built and validated, keyed by (hostname, endpoint, https)
+_urlCache: dict[tuple, str] = {}
+
+# The URL that commands for the current device are posted to, set by setDevice(): (IP address, URL)
+_postURL: tuple[str, str] = (None, None)
+
+# Matches a hex colour like FFCCFF or #FFCCFF
+_hexColourRegex = re.compile(r"^#?[0-9a-fA-F]{6}$")
+
+# Commands that change the settings returned by Channel/GetAllConf, so the cache needs to be thrown away.
+# Draw/CommandList is included because it can contain any of these
+_settingsMutatingCommands = ("Channel/Set", "Device/Set", "Sys/Set", "Channel/OnOffScreen", "Draw/CommandList")
+
+
+def _createSession():
+    """
+    Create a HTTP session
+
+    Creates a requests Session with connection pooling and a basic retry policy,
+    so that subsequent calls reuse the same connection instead of doing a new
+    TCP (and TLS, for the online API) handshake every time
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+
+    Session
+        The newly created session
+
+    """
+
+    session = Session()
+    # Also retry when a proxy or the online API says it's temporarily unavailable, but hand back the last response if it still is
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                          max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504),
+                                            allowed_methods=frozenset(("GET", "POST")), raise_on_status=False))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "User-Agent": "pixoo_api",
+        "Connection": "keep-alive"
+    })
+
+    return session
+
+
+# One session for the device on the local network, and one for the Divoom online API (and anything else on the internet)
+_local_session = _createSession()
+_online_session = _createSession()
+
+# Kept-alive connections to the device that nothing is posting on right now, as (hostname, connection). Threads take one
+# while they post a command and put it back afterwards, so a thread that exits doesn't leave one open. See _postToDevice()
+_idleConnections: list[tuple[str, HTTPConnection]] = []
+_idleConnectionsLock = threading.Lock()
+
+# How many idle connections to the device are kept open. Any more are closed once they've been used
+maxIdleConnections = 4
+
+# How many requests sendCommandAsync and sendOnlineCommandAsync send at the same time. The rest wait their turn
+asyncConcurrency = 10
+
+# The semaphores that enforce asyncConcurrency, one for each event loop, as they can't be shared between loops. See _asyncSemaphore()
+_asyncSemaphores: WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = WeakKeyDictionary()
+
+# Sends commands for sendCommand(async_=True) and frames for sendGIF in the background, and gets the settings for getWeather().
+# There's only one worker, so the device still gets everything in the order it was sent
+_sendExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pixoo-http")
+
+# Turns the frames in _imageDataToGIF into palette images at the same time. It's shared, so each GIF doesn't start threads of
+# its own, and there are only a few workers, as the frames are small enough that more wouldn't help
+_convertExecutor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="pixoo-gif")
+
+
+def closeSessions():
+    """
+    Close the HTTP sessions
+
+    Closes the connections to the device and the Divoom online API. Call this when
+    you're done with the device. The sessions will reconnect if you make another call
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+
+    bool
+        Returns True once the sessions have been closed
+
+    """
+
+    _local_session.close()
+    _online_session.close()
+
+    with _idleConnectionsLock:
+        for _, connection in _idleConnections:
+            connection.close()
+
+        _idleConnections.clear()
+
+    return True
+
+
+# Close the connections when Python exits, instead of leaving the device to time them out
+atexit.register(closeSessions)
+
 
 def getFirstDevice():
     """
@@ -63,8 +291,10 @@ def setDevice(deviceDetails: dict | str | DivoomDevice = None):
     Parameters
     ----------
 
-    device : dict | str | DivoomDevice, optional
-        Defaults to None. If a dict is passed, 
+    deviceDetails : dict | str | DivoomDevice, optional
+        Defaults to None. If a dict is passed, it's turned into a DivoomDevice. If a 
+        str is passed, it's treated as an IP address and the matching device is looked up.
+        If None, the current device is returned
 
     Returns
     -------
@@ -74,33 +304,130 @@ def setDevice(deviceDetails: dict | str | DivoomDevice = None):
 
     """
 
-    global device
+    global device, _postURL
 
-    # If we passed a string (i.e. an IP address)
-    if isinstance(device, str):
-        # Find all the devices and pick the first one that matches the IP address.
-        # Technically we don't need to findDevices(), but for the online commands we need the device ID
-        devices = findDevices()
+    # Nothing passed, so just return the current device
+    if deviceDetails is None:
+        return device
 
-        search = {"DevicePrivateIP": device}
-        for d in devices:
-            if {key: d[key] for key in d.keys() & search} == search:
-                device = d
-                break
+    handler = _handlerFor(_deviceHandlers, deviceDetails)
 
-        if len(devices) > 0:
-            device = devices[0]
-        else:
-            raise Exception("No devices found!")
-    # If we were handed a string (i.e. an IP address), set as appropriate
-    elif isinstance(deviceDetails, DivoomDevice):
-        device = deviceDetails
-    elif isinstance(deviceDetails, dict):
-        device = DivoomDevice(DevicePrivateIP=deviceDetails["DevicePrivateIP"], DeviceMac=deviceDetails["DeviceMac"],
-                              DeviceId=deviceDetails["DeviceId"], DeviceName=deviceDetails["DeviceName"])
+    if handler is None:
+        raise Exception("{details} is not a valid device!".format(details=deviceDetails))
+
+    device = handler(deviceDetails)
+
+    # Almost every command goes to this URL, so work it out (and check it) now instead of on every call
+    url = "http://{ip}/post".format(ip=device["DevicePrivateIP"])
+
+    if not _isValidURL(url):
+        raise Exception("URL {url} is not valid!".format(url=url))
+
+    _postURL = (device["DevicePrivateIP"], url)
 
     return device
 
+
+def _deviceFromIP(ipAddress: str):
+    """
+    Find a device by IP address
+
+    Finds the device on the network that has the given IP address
+
+    Parameters
+    ----------
+
+    ipAddress : str
+        The IP address of the device
+
+    Returns
+    -------
+
+    DivoomDevice
+        The device that was found
+    Exception
+        Returns an exception if no device with that IP address was found
+
+    """
+
+    # Technically we don't need to findDevices(), but for the online commands we need the device ID,
+    # so if we haven't seen this IP address before, look up the devices on the network.
+    # Always ask the online API, as a device we haven't seen won't be in the last list either
+    if ipAddress not in _devicesByIP:
+        findDevices(forceRefresh=True)
+
+    found = _devicesByIP.get(ipAddress)
+
+    if found is None:
+        raise Exception("No device found with IP address {ip}!".format(ip=ipAddress))
+
+    return _deviceFromDict(found)
+
+
+def _deviceFromDict(deviceDetails: dict):
+    """
+    Make a DivoomDevice from a dict
+
+    Makes a DivoomDevice out of a dict, like the ones returned by findDevices()
+
+    Parameters
+    ----------
+
+    deviceDetails : dict
+        A dict with DevicePrivateIP, DeviceMac, DeviceId and DeviceName keys
+
+    Returns
+    -------
+
+    DivoomDevice
+        The device
+
+    """
+
+    return DivoomDevice(DevicePrivateIP=deviceDetails["DevicePrivateIP"], DeviceMac=deviceDetails["DeviceMac"],
+                        DeviceId=deviceDetails["DeviceId"], DeviceName=deviceDetails["DeviceName"])
+
+
+# How to turn each of the types setDevice accepts into a DivoomDevice
+_deviceHandlers = {
+    str: _deviceFromIP,
+    dict: _deviceFromDict,
+    DivoomDevice: lambda d: d
+}
+
+
+def _handlerFor(handlers: dict, value):
+    """
+    Find the handler for a value
+
+    Looks up the handler for the type of value in a dispatch table (e.g. _deviceHandlers). Most values are
+    exactly one of the types in the table, so that's tried first. Otherwise, the handler for the closest type
+    it's based on is used, so that subclasses (like an OrderedDict, or a namedtuple) work too
+
+    Parameters
+    ----------
+
+    handlers : dict
+        The handlers, keyed by type
+    value : object
+        The value to find a handler for
+
+    Returns
+    -------
+
+    function | None
+        The handler, or None if there isn't one for this type
+
+    """
+
+    handler = handlers.get(type(value))
+
+    if handler is None:
+        handler = next((handlers[base] for base in type(value).__mro__[1:] if base in handlers), None)
+
+    return handler
+
+
 def _checkForDevice():
     """
     Check that a device has been discovered / set
@@ -170,205 +497,978 @@ def sendOnlineCommand(command: str, parameters={}, requireLogin=True, requireDev
     if requireLogin:
         if not _isLoggedIn():
             raise Exception("Command requies you to be logged in")
-        else:
-            data.update({
-                "DeviceId": device["DeviceId"],
-                "Token": user["Token"],
-                "UserId": user["UserId"]
-            })
+
+        data["Token"] = user["Token"]
+        data["UserId"] = user["UserId"]
+
     if requireDevice:
         if not _checkForDevice():
             raise Exception("Command requies a device to be set")
-        else:
-            data.update({
-                "Token": user["Token"],
-                "UserId": user["UserId"]
-            })
+
+        data["DeviceId"] = device["DeviceId"]
 
     # Then tack on any parameters (which are a dictionary)
     data.update(parameters)
 
+    queued = getattr(_batchState, "online", None)
+
+    if queued is not None:
+        if command in _batchableOnlineCommands:
+            # A later change to the same settings replaces an earlier one. Anything else is keyed by its place in the queue,
+            # so it's never replaced. Either way, whatever is queued can be sent in any order
+            key = frozenset(parameters) if command in _replaceableOnlineCommands else len(queued)
+            queued[(command, key)] = data
+            _invalidateSettings(command)
+            return None
+
+        # Anything else needs its response now, so send what's queued first to keep things in order
+        _batchState.online = {}
+        _sendOnlineBatch(queued)
+
     # Just call the API
+    response = callPixooAPI(data=data, hostname="appin.divoom-gz.com", endpoint=command, https=True)
+
+    # If this changed the device settings, make sure the next getSettings() asks the device again
+    _invalidateSettings(command)
+
+    return response
+
+
+@contextmanager
+def batch():
+    """
+    Batch up commands
+
+    While inside a `with pixoo.batch():` block, commands that change something are held back instead of
+    being sent straight away. When the block ends (or when you call flush()), the device commands (like
+    setBrightness or setClockFace) are sent in one Draw/CommandList call, and the online commands (like
+    setNightMode or setScoreboard) are all sent at the same time over the same session. If the same online
+    setting is changed more than once in the block, only the last change is sent.
+
+    Anything that needs a response (like getSettings or getAlarms) is still sent straight away, after
+    sending whatever has been held back so far, so everything reaches the device in order. Functions called
+    inside the block can't confirm their changes, so they return what you asked for instead, and
+    sendCommand returns None for commands that were held back. Batching only applies to the thread that
+    started it
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+
+    None
+        Use this as a context manager
+    Exception
+        Returns an exception if the API or a request returned an error. The rest of the commands are still sent
+
+    """
+
+    # If we're already batching, the outer block sends everything
+    if _isBatching():
+        yield
+        return
+
+    _batchState.local = []
+    _batchState.online = {}
+
     try:
-        return callPixooAPI(data=data, hostname="appin.divoom-gz.com", endpoint=command, https=True)
-    except Exception as e:
-        raise e
-    
-def sendCommand(command: str, parameters={}, batch=False):
+        yield
+    finally:
+        local, online = _batchState.local, _batchState.online
+        _batchState.local = _batchState.online = None
+        _sendBatched(local, online)
+
+
+def flush():
     """
-    Send a command to the device
+    Send batched commands now
 
-    Sends a command to the device. This puts together the necessary payload
+    Inside a batch() block, sends everything that has been held back so far, then carries on batching.
+    Outside a batch() block, this does nothing
 
     Parameters
     ----------
 
-    command : str
-        The command you want to call (e.g. Channel/SetEqPosition)
-    parameters : dict
-        Any additional parameters you want to send (e.g. { "EqPosition": 0 })
-    port : int, optional
-        The port to send on. Defaults to port 80 if not specified
-    batch : bool
-        If True, will return the command instead of executing it. You can use this to send multiple commands in one API call using Draw/CommandList, or you can save it to a server and call Draw/UseHTTPCommandSource
+    Returns
+    -------
+
+    bool
+        Returns True once the commands have been sent
+    Exception
+        Returns an exception if the API or a request returned an error
+
+    """
+
+    if _isBatching():
+        local, online = _batchState.local, _batchState.online
+        _batchState.local, _batchState.online = [], {}
+        _sendBatched(local, online)
+
+    return True
+
+
+def _sendBatched(local: list[dict], online: dict):
+    """
+    Send batched commands
+
+    Sends the device and online commands that batch() held back
+
+    Parameters
+    ----------
+
+    local : list[dict]
+        The device commands to send, in order
+    online : dict
+        The online commands to send, keyed by (command, parameter names or place in the queue)
 
     Returns
     -------
-    dict
-        If batch is False, the response as a dict. If batch is True, the command
+
+    None
+    Exception
+        Returns an exception if the API or a request returned an error. The online commands are still sent if the device commands fail
+
+    """
+
+    try:
+        _sendLocalBatch(local)
+    finally:
+        _sendOnlineBatch(online)
+
+
+def _sendLocalBatch(queued: list[dict]):
+    """
+    Send batched device commands
+
+    Sends the device commands that batch() held back in one Draw/CommandList call
+
+    Parameters
+    ----------
+
+    queued : list[dict]
+        The commands to send, in order
+
+    Returns
+    -------
+
+    dict | None
+        The response from the device, or None if there was nothing to send
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    if not queued:
+        return None
+
+    # There's no need to wrap a single command in a command list
+    if len(queued) == 1:
+        return callPixooAPI(data=queued[0])
+
+    return callPixooAPI(data=buildCommand("Draw/CommandList", CommandList=queued))
+
+
+def _isBatching():
+    """
+    Check if we're batching
+
+    Checks if we're inside a batch() block on this thread
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+
+    bool
+        True if we're batching, False otherwise
+
+    """
+
+    return getattr(_batchState, "online", None) is not None
+
+
+def _sendOnlineBatch(queued: dict):
+    """
+    Send batched online commands
+
+    Sends the online commands that batch() held back, all at the same time
+
+    Parameters
+    ----------
+
+    queued : dict
+        The commands to send, keyed by (command, parameter names or place in the queue)
+
+    Returns
+    -------
+
+    list[dict]
+        The response for each command
+    Exception
+        Returns an exception if the API or a request returned an error. The rest of the commands are still sent
+
+    """
+
+    if not queued:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(len(queued), 4)) as executor:
+        sent = [executor.submit(callPixooAPI, data=data, hostname="appin.divoom-gz.com", endpoint=command, https=True)
+                for (command, _), data in queued.items()]
+
+    return [result.result() for result in sent]
+
+
+def sendCommand(command: str, parameters={}, batch=False, async_=False):
+    """
+    Send a command to the device
+
+    Sends a command to the device. This puts together the necessary payload
+
+    Parameters
+    ----------
+
+    command : str
+        The command you want to call (e.g. Channel/SetEqPosition)
+    parameters : dict
+        Any additional parameters you want to send (e.g. { "EqPosition": 0 })
+    batch : bool
+        If True, will return the command instead of executing it. You can use this to send multiple commands in one API call using Draw/CommandList, or you can save it to a server and call Draw/UseHTTPCommandSource
+    async_ : bool
+        If True, the command is sent in the background and a Future is returned straight away, so you can
+        work on the next frame while this one is being sent. Commands sent this way arrive in the order they were sent
+
+    Returns
+    -------
+    dict
+        If batch is False, the response as a dict. If batch is True, the command
+    Future
+        If async_ is True. Call .result() on it to get the response (or the error)
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    if not _checkForDevice():
+        raise Exception("No device has been set up")
+
+    data = buildCommand(command, **parameters)
+
+    # If we're batching calls, just return the command, ready to send
+    if batch:
+        return data
+
+    # Inside a batch() block, hold back anything that doesn't need a response
+    queued = getattr(_batchState, "local", None)
+
+    if queued is not None and "/Get" not in command and command not in _unbatchableCommands:
+        queued.append(data)
+        _invalidateSettings(command)
+        return None
+
+    # Send it from the background worker. It isn't part of this thread's batch(), so send anything held back first
+    if async_:
+        flush()
+        future = _sendExecutor.submit(callPixooAPI, data=data)
+        future.add_done_callback(lambda sent: sent.exception() is None and _invalidateSettings(command))
+        return future
+
+    # Otherwise, send the call.
+    response = callPixooAPI(data=data)
+
+    # If this changed the device settings, make sure the next getSettings() asks the device again
+    _invalidateSettings(command)
+
+    return response
+
+
+async def sendCommandAsync(command: str, parameters={}):
+    """
+    Send a command to the device without blocking the event loop
+
+    Same as sendCommand, but can be awaited. The request runs on a worker thread
+    and shares the pooled connections, so you can use asyncio.gather to send
+    unrelated commands (e.g. getting the weather while polling the settings) at the same time.
+    No more than asyncConcurrency requests are sent at once
+
+    Parameters
+    ----------
+
+    command : str
+        The command you want to call (e.g. Channel/SetEqPosition)
+    parameters : dict
+        Any additional parameters you want to send (e.g. { "EqPosition": 0 })
+
+    Returns
+    -------
+    dict
+        The response as a dict
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    async with _asyncSemaphore():
+        return await asyncio.to_thread(sendCommand, command=command, parameters=parameters)
+
+
+async def sendOnlineCommandAsync(command: str, parameters={}, requireLogin=True, requireDevice=True):
+    """
+    Send a command to the Divoom Online API without blocking the event loop
+
+    Same as sendOnlineCommand, but can be awaited. See sendCommandAsync for details
+
+    Parameters
+    ----------
+
+    command : str
+        The command you want to call (e.g. Alarm/Get)
+    parameters : dict
+        Any additional parameters you want to send (e.g. { "EqPosition": 0 })
+
+    Returns
+    -------
+    dict
+        Returns the results
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    async with _asyncSemaphore():
+        return await asyncio.to_thread(sendOnlineCommand, command=command, parameters=parameters,
+                                       requireLogin=requireLogin, requireDevice=requireDevice)
+
+
+def _asyncSemaphore():
+    """
+    Get the semaphore for the running event loop
+
+    Gets the semaphore that stops sendCommandAsync and sendOnlineCommandAsync from sending more than
+    asyncConcurrency requests at once, so that gathering lots of commands doesn't use up every worker thread
+    or swamp the device
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+
+    asyncio.Semaphore
+        The semaphore for the running event loop
+
+    """
+
+    loop = asyncio.get_running_loop()
+    semaphore = _asyncSemaphores.get(loop)
+
+    if semaphore is None:
+        semaphore = _asyncSemaphores[loop] = asyncio.Semaphore(asyncConcurrency)
+
+    return semaphore
+
+
+def buildCommand(command: str, **parameters):
+    """
+    Build a command
+
+    Builds the payload for a command without sending it. This is the same as
+    sendCommand with batch=True, but doesn't need a device to be set
+
+    Parameters
+    ----------
+
+    command : str
+        The command you want to call (e.g. Channel/SetBrightness)
+    **parameters
+        Any additional parameters you want to send (e.g. Brightness=100)
+
+    Returns
+    -------
+
+    dict
+        The command, ready to send (e.g. { "Command": "Channel/SetBrightness", "Brightness": 100 })
+
+    """
+
+    return {"Command": command, **parameters}
+
+
+def sendBatchCommands(parameters: list[dict | tuple[str, dict]], port=None, wait=None, async_=False):
+    """
+    Send multiple commands to the device
+
+    Sends a batch of commands to the device in one request, using Draw/CommandList
+
+    Parameters
+    ----------
+
+    parameters : list[dict | tuple[str, dict]]
+        A list of commands to send. Each one can be a command built with buildCommand or
+        sendCommand(batch=True), or a (command, parameters) tuple, e.g. ("Channel/SetBrightness", { "Brightness": 100 })
+    port : int, optional
+        Deprecated and ignored, as the device only listens on port 80. Passing it raises a DeprecationWarning
+    wait : bool, optional
+        Deprecated and ignored. Passing it raises a DeprecationWarning
+    async_ : bool
+        If True, the commands are sent in the background and a Future is returned straight away. See sendCommand
+
+    Returns
+    -------
+
+    bool
+        Returns True, as the API won't return the results for each request. This means you can't use this to retrieve the weather and settings in one call, for example
+    Future
+        If async_ is True
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    if port is not None or wait is not None:
+        warnings.warn("sendBatchCommands() ignores port and wait, and they will be removed in a future version",
+                      DeprecationWarning, stacklevel=2)
+
+    # Build any (command, parameters) tuples in one pass
+    commands = [buildCommand(c[0], **c[1]) if isinstance(c, tuple) else c for c in parameters]
+
+    response = sendCommand(command="Draw/CommandList",
+                           parameters={"CommandList": commands}, async_=async_)
+
+    return response
+
+
+def _sendCommandList(commands: list[dict]):
+    """
+    Send a list of commands and return each result
+
+    Sends each command in turn over the same (kept alive) connection. Unlike
+    sendBatchCommands, which uses Draw/CommandList and can't return anything,
+    this returns the response for every command, so you can do a write and 
+    read the result back without opening a new connection
+
+    Parameters
+    ----------
+
+    commands : list[dict]
+        A list of commands, as returned by sendCommand with batch=True
+
+    Returns
+    -------
+
+    list[dict]
+        The response for each command, in the same order as the commands
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    responses = [callPixooAPI(data=command) for command in commands]
+
+    for command in commands:
+        _invalidateSettings(command["Command"])
+
+    return responses
+
+
+def _swr(name: str, fetch, fresh=1.0, stale=10.0, forceRefresh=False):
+    """
+    Get a value, stale-while-revalidate
+
+    Returns a copy of the last result of fetch() for the current device. If it's newer than fresh seconds, it's returned
+    as-is. If it's older than fresh, but newer than stale seconds, it's returned straight away and refreshed in the background
+    for next time. Otherwise (or if forceRefresh is True), fetch() is called and we wait for the result. fetch() is given the
+    device, so a refresh in the background still asks the same device if setDevice() is called in the meantime
+
+    Parameters
+    ----------
+
+    name : str
+        The name of the getter, used to store the result
+    fetch : function
+        Gets the value from the device (which is passed to it) or API
+    fresh : float, optional
+        How old (in seconds) the value can be before it's refreshed in the background. Defaults to 1
+    stale : float, optional
+        How old (in seconds) the value can be before we wait for a new one. Defaults to 10
+    forceRefresh : bool, optional
+        If True, always calls fetch() and waits for the result. Defaults to False
+
+    Returns
+    -------
+
+    object
+        Whatever fetch() returns
+    Exception
+        Returns an exception if fetch() raised one
+
+    """
+
+    forDevice = device
+    key = (name, forDevice["DevicePrivateIP"] if forDevice else None)
+    cached = _swrCache.get(key)
+    age = time.monotonic() - cached[0] if cached else stale
+
+    if forceRefresh or age >= stale:
+        return _swrRefresh(key, fetch, forDevice)
+
+    if age >= fresh:
+        with _swrLock:
+            if key not in _swrRefreshing:
+                _swrRefreshing.add(key)
+                threading.Thread(target=_swrRefresh, args=(key, fetch, forDevice), daemon=True).start()
+
+    # The same result is returned to every caller, so don't let one of them change it for the others
+    return copy.deepcopy(cached[1])
+
+
+def _swrRefresh(key: tuple, fetch, forDevice: dict):
+    """
+    Refresh a stale-while-revalidate value
+
+    Calls fetch() and stores a copy of the result for _swr
+
+    Parameters
+    ----------
+
+    key : tuple
+        The key to store the result under
+    fetch : function
+        Gets the value from the device or API
+    forDevice : dict
+        The device the value is for, which is passed to fetch()
+
+    Returns
+    -------
+
+    object
+        Whatever fetch() returns
+    Exception
+        Returns an exception if fetch() raised one
+
+    """
+
+    try:
+        value = fetch(forDevice)
+        _swrCache[key] = (time.monotonic(), copy.deepcopy(value))
+
+        return value
+    finally:
+        with _swrLock:
+            _swrRefreshing.discard(key)
+
+
+def _swrInvalidate(name: str):
+    """
+    Forget a stale-while-revalidate value
+
+    Throws away the stored result of a getter for the current device, so the next call waits for a new one.
+    Call this after changing something that a getter returns
+
+    Parameters
+    ----------
+
+    name : str
+        The name of the getter
+
+    """
+
+    _swrCache.pop((name, device["DevicePrivateIP"] if device else None), None)
+
+
+def _getFromDevice(forDevice: dict, command: str):
+    """
+    Get something from a device
+
+    Sends a command that gets something (e.g. Tools/GetScoreBoard) to the given device, rather than the current one.
+    Used by the getters that go through _swr, as their refresh might run after setDevice() has been called
+
+    Parameters
+    ----------
+
+    forDevice : dict
+        The device to ask
+    command : str
+        The command you want to call (e.g. Draw/GetHttpGifId)
+
+    Returns
+    -------
+
+    dict
+        The response as a dict
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    if not isinstance(forDevice, DivoomDevice):
+        raise Exception("No device has been set up")
+
+    return callPixooAPI(data=buildCommand(command), hostname=forDevice["DevicePrivateIP"])
+
+
+def _isValidURL(url: str):
+    """
+    Check if a URL is valid
+
+    Checks that a URL is a http:// or https:// URL with a hostname. This is all
+    we need to check before sending a request, so there's no need for a full URL parser
+
+    Parameters
+    ----------
+
+    url : str
+        The URL to check
+
+    Returns
+    -------
+
+    bool
+        True if the URL is valid, False otherwise
+
+    """
+
+    if url.startswith("https://"):
+        rest = url[8:]
+    elif url.startswith("http://"):
+        rest = url[7:]
+    else:
+        return False
+
+    # The hostname is everything up to the first slash (if there is one), and it can't be empty
+    slash = rest.find("/")
+
+    return slash > 0 or (slash == -1 and len(rest) > 0)
+
+
+def _jsonDefault(obj):
+    """
+    Serialize types orjson doesn't know about
+
+    orjson won't serialize NamedTuples (like Colour), while the built-in json module
+    turns them into lists, so we do the same here
+
+    Parameters
+    ----------
+
+    obj : object
+        The object that orjson couldn't serialize
+
+    Returns
+    -------
+
+    list
+        The tuple as a list
+    TypeError
+        Raises a TypeError if the object can't be serialized
+
+    """
+
+    if isinstance(obj, tuple):
+        return list(obj)
+
+    raise TypeError("Object of type {type} is not JSON serializable".format(type=type(obj).__name__))
+
+
+def _encodeJSON(data: dict):
+    """
+    Encode a payload as JSON
+
+    Encodes a payload as JSON bytes, using orjson if it's installed. Commands
+    without any parameters (like Device/Hearbeat) always encode to the same bytes,
+    so those are only encoded once, and commands in _commandTemplates just have
+    their value dropped into a template
+
+    Parameters
+    ----------
+
+    data : dict
+        The payload to encode
+
+    Returns
+    -------
+
+    bytes
+        The encoded payload
+
+    """
+
+    if len(data) == 1 and "Command" in data:
+        encoded = _encodedCommands.get(data["Command"])
+
+        if encoded is None:
+            encoded = _encodedCommands[data["Command"]] = _dumpJSON(data)
+
+        return encoded
+
+    if len(data) == 2:
+        template = _commandTemplates.get(data.get("Command"))
+
+        # Only plain ints, as bools and enums (for example) wouldn't be encoded the same way
+        if template is not None and type(data.get(template[0])) is int:
+            return template[1] % data[template[0]]
+
+    return _dumpJSON(data)
+
+
+def _dumpJSON(data: dict):
+    """
+    Dump a payload to JSON
+
+    Dumps a payload to JSON bytes, using orjson if it's installed
+
+    Parameters
+    ----------
+
+    data : dict
+        The payload to dump
+
+    Returns
+    -------
+
+    bytes
+        The dumped payload
+
+    """
+
+    if orjson:
+        return orjson.dumps(data, default=_jsonDefault)
+
+    return json.dumps(data).encode("utf-8")
+
+
+def _decodeJSON(content: bytes):
+    """
+    Decode a JSON response
+
+    Decodes a JSON response, using orjson if it's installed
+
+    Parameters
+    ----------
+
+    content : bytes
+        The raw response from the device or online API
+
+    Returns
+    -------
+
+    dict
+        The decoded response
+
+    """
+
+    if orjson:
+        return orjson.loads(content)
+
+    return json.loads(content)
+
+
+def callPixooAPI(data: dict, hostname=None, endpoint="post", https=False, readTimeout: float = None):
+    """
+    Send a message to the device or online API
+
+    Sends data to the device or online API using the requests library
+
+    Parameters
+    ----------
+
+    data : dict
+        A dictionary that contains a valid Command, and optional parameters
+    hostname : str, optional
+        The ipAddress or hostname to send the command to. Defaults to the first discovered Pixoo on the network
+    endpoint : str, optional
+        The command you want to run. To get a list of alarms, this would be "Alarm/Get". Defaults to "post"
+    https : bool, optional
+        If true, uses HTTPS instead of HTTP
+    readTimeout : float, optional
+        How long (in seconds) to wait for a response to this call. Defaults to timeout
+
+    Returns
+    -------
+    dict
+        The response as a dict
+    PixooAPIError
+        Returns a PixooAPIError if the API returned an error code. The code is in .code
     Exception
-        Returns an exception if the API or the request returned an error
+        Returns an exception if the request returned an error
 
     """
 
-    if not _checkForDevice():
-        raise Exception("No device has been set up")
+    # Anything batch() has held back for the device has to be sent first, so commands reach the device in order
+    if not https and getattr(_batchState, "local", None):
+        queued = _batchState.local
+        _batchState.local = []
+        _sendLocalBatch(queued)
 
-    # Add the common fields here
-    data = {
-        "Command": command
-    }
+    if hostname is None:
+        hostname = device["DevicePrivateIP"]
 
-    # Then tack on any parameters (which are a dictionary)
-    data.update(parameters)
+    # Commands for the current device go to the URL setDevice() worked out.
+    # Otherwise, the URL is always the same for a given hostname and endpoint, so only build and validate it once
+    toDevice = endpoint == "post" and not https and hostname == _postURL[0]
 
-    try:
-        # If we're batching calls, just return the command, ready to send
-        if batch:
-            return data
-        # Otherwise, send the call.
-        else:
-            return callPixooAPI(data=data)
+    if toDevice:
+        url = _postURL[1]
+    else:
+        urlKey = (hostname, endpoint, https)
+        url = _urlCache.get(urlKey)
+
+    if url is None:
+        url = f"http{'s' if https else ''}://{hostname}/{endpoint}"
+        # If we've got a valid URL
+        if not _isValidURL(url):
+            raise Exception("URL {url} is not valid!".format(url=url))
+
+        _urlCache[urlKey] = url
+
+    if debug:
+        print("Sending data to {url}: {data}".format(url=url, data=data))
+        response = None
+    elif toDevice:
+        # Most calls (including every GIF frame) end up here, so skip requests and post straight on the kept-alive connection
+        response = _decodeJSON(_postToDevice(hostname, _encodeJSON(data), readTimeout=readTimeout))
+    else:
+        session = _online_session if https else _local_session
+        response = _decodeJSON(session.post(url, data=_encodeJSON(data), headers={
+                               "Content-Type": "application/json"}, timeout=(connectTimeout, readTimeout or timeout)).content)
+
+    if response:
+        # The online API returns a non-zero ReturnCode if something went wrong, and the device returns a non-zero error_code
+        returnCode = response.get("ReturnCode")
+        if returnCode:
+            raise PixooAPIError(response.get("ReturnMessage", "n/a"), returnCode)
+
+        errorCode = response.get("error_code")
+        if errorCode:
+            raise PixooAPIError("n/a", errorCode)
 
-    except Exception as e:
-        raise e
+    return response
 
 
-def sendBatchCommands(parameters: list[dict], port=80, wait=False):
+def _postToDevice(hostname: str, body: bytes, readTimeout: float = None):
     """
-    Send multiple commands to the device
+    Post a command to the device
 
-    Seconds a batch of commands to the device. 
+    Posts an encoded command to /post on the device using http.client. The device is on the
+    local network, so the time requests spends on each call (cookies, adapters, pooling) is
+    a big part of the total. The connection is kept alive and shared between threads (see
+    _takeConnection)
 
     Parameters
     ----------
 
-    parameters : list[dict]
-        A list of commands to send. Same format as sendCommand, but in a list
-    port : int, optional
-        The port to send on. Defaults to port 80 if not specified
+    hostname : str
+        The IP address of the device
+    body : bytes
+        The encoded command, from _encodeJSON()
+    readTimeout : float, optional
+        How long (in seconds) to wait for the device to respond. Defaults to timeout
 
     Returns
     -------
 
-    bool
-        Returns True, as the API won't return the results for each request. This means you can't use this to retrieve the weather and settings in one call, for example
+    bytes
+        The raw response from the device
     Exception
-        Returns an exception if the API or the request returned an error
+        Raises requests.exceptions.Timeout or requests.exceptions.ConnectionError if the request failed
 
     """
 
+    connection = _takeConnection(hostname)
+
+    # Once the command has been sent, trying again could run it twice (e.g. skipping two tracks), so don't.
+    # Errors are raised as requests exceptions, the same as calls to the online API
     try:
-        response = sendCommand(command="Draw/CommandList",
-                               parameters={"CommandList": parameters}, port=port, wait=wait)
-    except Exception as e:
-        raise e
+        if connection.sock is None:
+            connection.connect()
+
+        connection.sock.settimeout(readTimeout or timeout)
+
+        connection.request("POST", "/post", body=body, headers={"Content-Type": "application/json", "User-Agent": "pixoo_api"})
+
+        response = connection.getresponse().read()
+
+    except TimeoutError as e:
+        # We don't know what state the connection is in now, so don't use it again
+        connection.close()
+        raise RequestsTimeout(e) from e
+
+    except (OSError, HTTPException) as e:
+        connection.close()
+        raise RequestsConnectionError(e) from e
+
+    # The whole response has been read, so the connection is ready for the next command
+    _returnConnection(hostname, connection)
 
     return response
 
 
-def callPixooAPI(data: dict, hostname=None, endpoint="post", https=False):
+def _takeConnection(hostname: str):
     """
-    Send a message to the device or online API
+    Take a connection to the device
 
-    Sends data to the device or online API using the requests library
+    Takes an idle kept-alive connection to the device out of _idleConnections, or makes a new one if there
+    aren't any. Idle connections to a different device (e.g. after setDevice()) are closed, and so are
+    connections the device has closed while they were idle, before anything is sent on them
 
     Parameters
     ----------
 
-    data : dict
-        A dictionary that contains a valid Command, and optional parameters
-    hostname : str, optional
-        The ipAddress or hostname to send the command to. Defaults to the first discovered Pixoo on the network
-    endpoint : str, optional
-        The command you want to run. To get a list of alarms, this would be "Alarm/Get". Defaults to "post"
-    https : bool, optional
-        If true, uses HTTPS instead of HTTP
+    hostname : str
+        The IP address of the device
 
     Returns
     -------
-    dict
-        The response as a dict
-    Exception
-        Returns an exception if the API or the request returned an error
 
-    """
+    HTTPConnection
+        The connection, which nothing else will use until it's given back with _returnConnection()
 
-    if hostname is None:
-        hostname = device["DevicePrivateIP"]
+    """
 
-    url = "http{s}://{hostname}/{endpoint}".format(
-        s="s" if https else "", hostname=hostname, endpoint=endpoint)
-    parsedUrl = urlparse(url)
-    # If we've got a valid URL
-    if all([parsedUrl.scheme, parsedUrl.netloc]):
-        if debug:
-            print("Sending data to {url}: {data}".format(url=url, data=data))
-        else:
-            response = request(
-                method="post", url=url, json=data).json()
-    else:
-        raise Exception("URL {url} is not valid!".format(url=url))
+    with _idleConnectionsLock:
+        while _idleConnections:
+            idleHostname, connection = _idleConnections.pop()
 
-    if response:
-        # Now we need to check for errors
-        error = _checkForErrors(response)
+            # If the device closed the connection while it was idle, there's something to read (the end of it)
+            # before we've sent anything. Nothing has been sent on it yet, so it's safe to use a different one instead
+            if idleHostname == hostname and not (connection.sock and select.select([connection.sock], [], [], 0)[0]):
+                return connection
 
-        if error:
-            raise Exception("Error code returned from API: {message} ({code})".format(
-                message=error["message"], code=error["code"]))
+            connection.close()
 
-    return response
+    return HTTPConnection(hostname, timeout=connectTimeout)
 
 
-def _checkForErrors(response: dict):
+def _returnConnection(hostname: str, connection: HTTPConnection):
     """
-    Checks a response for errors
+    Give a connection back
 
-    Looks through a response from the API and tries to discover any error messages
+    Puts a connection from _takeConnection() back in _idleConnections for the next command, or closes it
+    if there are already maxIdleConnections idle connections
 
     Parameters
     ----------
-    response : dict
-        The dictionary to look through
+
+    hostname : str
+        The IP address of the device
+    connection : HTTPConnection
+        The connection to give back
 
     Returns
     -------
+
     None
-        If no errors are found, None is returned
-    Exception
-        If an error is found, the error is returned. This lets the other functions raise errors
 
     """
 
-    error = {}
-
-    # If we've got a ReturnCode
-    if "ReturnCode" in response:
-        if response["ReturnCode"] != 0:
-            error["message"] = response["ReturnMessage"]
-            error["code"] = response["ReturnCode"]
+    with _idleConnectionsLock:
+        if len(_idleConnections) < maxIdleConnections:
+            _idleConnections.append((hostname, connection))
+            return
 
-    # If we've got an error_code instead..
-    if "error_code" in response:
-        if response["error_code"] != 0:
-            error["message"] = "n/a"
-            error["code"] = response["error_code"]
-
-    if error:
-        return error
-    else:
-        return None
+    connection.close()
 
 
 def heartbeat():
@@ -390,24 +1490,24 @@ def heartbeat():
         Returns an exception if the API or the request returned an error        
     """
 
-    try:
-        # IMPORTANT: That's not a typo! It really is "Hearbeat", with the missing "T" in the middle!!
-        sendCommand(command="Device/Hearbeat")
-    except Exception as e:
-        raise e
+    # IMPORTANT: That's not a typo! It really is "Hearbeat", with the missing "T" in the middle!!
+    sendCommand(command="Device/Hearbeat")
 
     return True
 
 
-def findDevices():
+def findDevices(forceRefresh=False):
     """
     Find devices on the network
 
-    Finds any devices on the local network. 
+    Finds any devices on the local network. The list is reused for devicesTTL seconds,
+    as devices don't come and go very often
 
     Parameters
     ----------
 
+    forceRefresh : bool, optional
+        If True, always asks the online API, even if the devices were found recently. Defaults to False
 
     Returns
     -------
@@ -429,12 +1529,17 @@ def findDevices():
 
     """
 
-    try:
-        response = sendOnlineCommand(command="Device/ReturnSameLANDevice", requireDevice=False, requireLogin=False)
-    except Exception as e:
-        raise e
+    # If we've found the devices recently, just reuse them
+    if not forceRefresh and _devicesCache["data"] is not None and time.monotonic() - _devicesCache["ts"] < devicesTTL:
+        return list(_devicesCache["data"])
+
+    response = sendOnlineCommand(command="Device/ReturnSameLANDevice", requireDevice=False, requireLogin=False)
 
-    return response["DeviceList"]
+    # Remember each device by IP address, so setDevice can look them up directly
+    _devicesByIP.update({d["DevicePrivateIP"]: d for d in response["DeviceList"]})
+    _devicesCache.update(ts=time.monotonic(), data=response["DeviceList"])
+
+    return list(response["DeviceList"])
 
 
 def sendCommandsFromURL(url: str):
@@ -469,30 +1574,27 @@ def sendCommandsFromURL(url: str):
 
     """
 
-    try:
-
-        result = urlparse(url)
-        if all([result.scheme, result.netloc]):
-            sendCommand(command="Draw/UseHTTPCommandSource",
-                                parameters={"CommandUrl": url})
-        else:
-            raise Exception("URL {url} is not valid!".format(url=url))
-
-    except Exception as e:
-        raise e
+    if _isValidURL(url):
+        sendCommand(command="Draw/UseHTTPCommandSource",
+                            parameters={"CommandUrl": url})
+    else:
+        raise Exception("URL {url} is not valid!".format(url=url))
 
     return True
 
 
-def getSettings():
+def getSettings(forceRefresh=False):
     """
     Gets the device settings
 
-    Gets the device settings. 
+    Gets the device settings. The result is reused for settingsTTL seconds, or until
+    a command that changes the settings is sent
 
     Parameters
     ----------
 
+    forceRefresh : bool, optional
+        If True, always asks the device, even if the settings were fetched recently. Defaults to False
 
     Returns
     -------
@@ -549,16 +1651,132 @@ def getSettings():
 
     """
 
-    try:
+    # If we've fetched the settings for this device recently, just reuse them
+    if not forceRefresh and _settingsFresh():
+        return dict(_settingsCache["data"])
+
+    with _settingsLock:
+        # Another thread may have fetched the settings while we were waiting for the lock
+        if not forceRefresh and _settingsFresh():
+            return dict(_settingsCache["data"])
+
         response = sendCommand(command="Channel/GetAllConf")
 
         # Delete the error code, as if we've reached this point, we haven't hit an error
         del response["error_code"]
 
-    except Exception as e:
-        raise e
+        _settingsCache.update(ip=device["DevicePrivateIP"], ts=time.monotonic(), data=response)
 
-    return response
+    return dict(response)
+
+
+def _settingsFresh():
+    """
+    Check if the cached settings can be used
+
+    Checks if getSettings() fetched the settings for the current device less than settingsTTL seconds ago
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+
+    bool
+        True if the cached settings can be used, False otherwise
+
+    """
+
+    deviceIP = device["DevicePrivateIP"] if device else None
+
+    return _settingsCache["ip"] == deviceIP and time.monotonic() - _settingsCache["ts"] < settingsTTL
+
+
+def _invalidateSettings(command: str):
+    """
+    Throw away the cached settings if a command changes them
+
+    Makes the next getSettings() ask the device again if command is one that changes the settings
+    returned by Channel/GetAllConf. This is done once the command has been sent successfully, and also when batch()
+    holds it back, so getSettings() inside a batch() doesn't return the settings from before the change
+
+    Parameters
+    ----------
+
+    command : str
+        The command that is being sent or held back (e.g. Channel/SetBrightness)
+
+    Returns
+    -------
+
+    None
+
+    """
+
+    if command.startswith(_settingsMutatingCommands):
+        _settingsCache["ts"] = 0.0
+
+
+def _setAndGetSettings(command: str, parameters={}):
+    """
+    Change a setting and read the settings back
+
+    Sends a command that changes a setting, then gets the settings over the same connection.
+    The settings are cached, so calling getSettings() straight afterwards doesn't ask the device again
+
+    Parameters
+    ----------
+
+    command : str
+        The command that changes the setting (e.g. Channel/SetBrightness)
+    parameters : dict
+        The parameters for the command (e.g. { "Brightness": 100 })
+
+    Returns
+    -------
+
+    dict
+        The settings, after the change was made
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    responses = _sendCommandList([
+        sendCommand(command=command, parameters=parameters, batch=True),
+        sendCommand(command="Channel/GetAllConf", batch=True)
+    ])
+
+    settings = responses[-1]
+    del settings["error_code"]
+
+    _settingsCache.update(ip=device["DevicePrivateIP"], ts=time.monotonic(), data=settings)
+
+    return dict(settings)
+
+
+def _enumToInt(value: Enum | int | bool):
+    """
+    Turn an enum (or bool) into an int
+
+    The enums in pixooapi.types aren't ints, so they can't be sent as they are. This turns
+    them (and bools) into plain ints once, before the command is built
+
+    Parameters
+    ----------
+
+    value : Enum | int | bool
+        The value to send, e.g. Channels.CLOCK or 0
+
+    Returns
+    -------
+
+    int
+        The value as an int
+
+    """
+
+    return int(value.value if isinstance(value, Enum) else value)
 
 
 def getBrightness():
@@ -580,15 +1798,12 @@ def getBrightness():
 
     """
 
-    try:
-        response = getSettings()
-    except Exception as e:
-        raise e
+    response = getSettings()
 
     return int(response["Brightness"])
 
 
-def setBrightness(brightness: int):
+def setBrightness(brightness: int, verify: bool = None):
     """
     Set the brightness of the device
 
@@ -599,24 +1814,27 @@ def setBrightness(brightness: int):
 
     brightness : int
         The brightness to set the display to. Between 0 and 100. Values higher than 100 get clamped to 100
+    verify : bool
+        If true, read the brightness back from the device to confirm the change was made. Defaults to verifyWrites
 
     Returns
     -------
     int
-        The brightness of the screen, between 0 and 100
+        The brightness of the screen, between 0 and 100. Without verify, this is the brightness you asked for
     Exception
         Returns an exception if the API or the request returned an error
 
     """
 
-    try:
-        sendCommand(command="Channel/SetBrightness",
-                            parameters={"Brightness": brightness})
-    except Exception as e:
-        raise e
+    # The device only returns a ReturnCode of 0 if the change was made, so there's no need to ask it again unless told to
+    if not (verifyWrites if verify is None else verify):
+        sendCommand(command="Channel/SetBrightness", parameters={"Brightness": brightness})
+        return brightness
+
+    # Set the brightness, then get the actual display brightness back over the same connection to confirm the change was made.
+    settings = _setAndGetSettings(command="Channel/SetBrightness", parameters={"Brightness": brightness})
 
-    # Get the actual display brightness from the API and return that to confirm the change was made.
-    return getBrightness()
+    return int(settings["Brightness"])
 
 
 def setWhiteBalance(rgb: Colour | str | dict | list | tuple):
@@ -654,26 +1872,58 @@ def setWhiteBalance(rgb: Colour | str | dict | list | tuple):
 
     """
 
-    rgbColour = Colour(0, 0, 0)
-
-    try:
+    handler = _handlerFor(_colourHandlers, rgb)
 
-        if isinstance(rgb, str):
-            rgbColour = tuple(int(rgb[i:i+2], 16) for i in (0, 2, 4))
+    if handler is None:
+        raise Exception("{rgb} is not a valid colour!".format(rgb=rgb))
 
-        if isinstance(rgb, tuple) or isinstance(rgb, list):
-            rgbColour = Colour(rgb[0], rgb[1], rgb[2])
-        elif isinstance(rgb, dict):
-            rgbColour = Colour(rgb.red, rgb.green, rgb.blue)
+    rgbColour = handler(rgb)
 
-        sendCommand(command="Device/SetWhiteBalance",
-                            parameters={"RValue": rgbColour.red, "GValue": rgbColour.green, "BValue": rgbColour.blue})
-    except Exception as e:
-        raise e
+    sendCommand(command="Device/SetWhiteBalance",
+                        parameters={"RValue": rgbColour.red, "GValue": rgbColour.green, "BValue": rgbColour.blue})
 
     return rgb
 
 
+def _colourFromHex(rgb: str):
+    """
+    Make a Colour from a hex string
+
+    Parameters
+    ----------
+
+    rgb : str
+        A hex string with or without the # (e.g. FFCCFF or #FFCCFF)
+
+    Returns
+    -------
+
+    Colour
+        The colour
+    Exception
+        Returns an exception if the string isn't a valid hex colour
+
+    """
+
+    if not _hexColourRegex.match(rgb):
+        raise Exception("{rgb} is not a valid hex colour!".format(rgb=rgb))
+
+    # Parse the whole string in one go, then pull out red, green and blue
+    value = int(rgb.lstrip("#"), 16)
+
+    return Colour((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF)
+
+
+# How to turn each of the types setWhiteBalance accepts into a Colour
+_colourHandlers = {
+    str: _colourFromHex,
+    tuple: lambda rgb: Colour(rgb[0], rgb[1], rgb[2]),
+    list: lambda rgb: Colour(rgb[0], rgb[1], rgb[2]),
+    dict: lambda rgb: Colour(rgb["red"], rgb["green"], rgb["blue"]),
+    Colour: lambda rgb: rgb
+}
+
+
 def getChannel():
     """
     Get the currently displayed channel
@@ -693,10 +1943,7 @@ def getChannel():
 
     """
 
-    try:
-        response = sendCommand(command="Channel/GetIndex")
-    except Exception as e:
-        raise e
+    response = sendCommand(command="Channel/GetIndex")
 
     return response["SelectIndex"]
 
@@ -723,11 +1970,8 @@ def setTimezone(timezone: str):
 
     """
 
-    try:
-        sendCommand(command="Sys/TimeZone",
-                    parameters={"TimeZoneValue": timezone})
-    except Exception as e:
-        raise e
+    sendCommand(command="Sys/TimeZone",
+                parameters={"TimeZoneValue": timezone})
 
     return timezone
 
@@ -745,18 +1989,13 @@ def getTime():
     -------
 
     datetime.datetime
-        The time as a datetime.datetime
+        The time as a timezone aware (UTC) datetime.datetime
 
     """
 
-    try:
-        response = sendCommand(command="Device/GetDeviceTime")
-        time = datetime.datetime.fromtimestamp(response["UTCTime"])
-
-    except Exception as e:
-        raise e
+    response = sendCommand(command="Device/GetDeviceTime")
 
-    return time
+    return datetime.datetime.fromtimestamp(response["UTCTime"], datetime.timezone.utc)
 
 
 def setTime(time: int | datetime.datetime):
@@ -775,18 +2014,16 @@ def setTime(time: int | datetime.datetime):
     -------
 
     datetime.datetime
-        The time you passed as a datetime.datetime
+        The time you passed as a datetime.datetime. If you passed a datetime, it's returned as-is
 
     """
 
-    try:
-
-        if isinstance(time, datetime.datetime):
-            time = time.timestamp()
+    # If we were given a datetime, there's no need to convert the timestamp back again, just return what we were given
+    if isinstance(time, datetime.datetime):
+        sendCommand(command="Device/SetUTC", parameters={"Utc": int(time.timestamp())})
+        return time
 
-        sendCommand(command="Device/SetUTC", parameters={"Utc": time})
-    except Exception as e:
-        raise e
+    sendCommand(command="Device/SetUTC", parameters={"Utc": time})
 
     return datetime.datetime.fromtimestamp(time)
 
@@ -815,10 +2052,7 @@ def setHourMode(mode: TimeMode | int):
 
     """
 
-    try:
-        sendCommand(command="Device/SetTime24Flag", parameters={"Mode": mode})
-    except Exception as e:
-        raise e
+    sendCommand(command="Device/SetTime24Flag", parameters={"Mode": _enumToInt(mode)})
 
     return mode
 
@@ -846,11 +2080,8 @@ def setEnhancedBrightnessMode(enabled: bool):
         True for enabled, False for disabled
     """
 
-    try:
-        sendOnlineCommand(command="Sys/SetConf",
-                          parameters={"HighLight": enabled}, requireDevice=True, requireLogin=True)
-    except Exception as e:
-        raise e
+    sendOnlineCommand(command="Sys/SetConf",
+                      parameters={"HighLight": enabled}, requireDevice=True, requireLogin=True)
 
     return enabled
 
@@ -887,11 +2118,8 @@ def setDateFormat(format: DateFormat):
         The format it's set to
     """
 
-    try:
-        sendOnlineCommand(command="Sys/SetConf",
-                          parameters={"DateFormat": format}, requireDevice=True, requireLogin=True)
-    except Exception as e:
-        raise e
+    sendOnlineCommand(command="Sys/SetConf",
+                      parameters={"DateFormat": _enumToInt(format)}, requireDevice=True, requireLogin=True)
 
     return format
 
@@ -925,11 +2153,8 @@ def setRotationAngle(angle: Rotation):
 
     """
 
-    try:
-        sendCommand(command="Device/SetScreenRotationAngle",
-                    parameters={"Mode": angle})
-    except Exception as e:
-        raise e
+    sendCommand(command="Device/SetScreenRotationAngle",
+                parameters={"Mode": _enumToInt(angle)})
 
     return angle
 
@@ -955,16 +2180,13 @@ def setMirroredMode(mirrored: bool):
 
     """
 
-    try:
-        sendCommand(command="Device/SetMirrorMode",
-                    parameters={"Mode": int(mirrored)})
-    except Exception as e:
-        raise e
+    sendCommand(command="Device/SetMirrorMode",
+                parameters={"Mode": int(mirrored)})
 
     return mirrored
 
 
-def setChannel(channel: Channels):
+def setChannel(channel: Channels, verify: bool = None):
     """
     Set the currently displayed channel
 
@@ -986,6 +2208,8 @@ def setChannel(channel: Channels):
                 Displays 1 of 3 groups of custom GIFs that you've added. These groups are called pages in the API
             Channels.BLANK : int
                 Displays no image (i.e. a blank screen). To power down (turn off) the display instead, use setScreenState.
+    verify : bool
+        If true, read the channel back from the device to confirm the change was made. Defaults to verifyWrites
 
     Returns
     -------
@@ -996,13 +2220,19 @@ def setChannel(channel: Channels):
 
     """
 
-    try:
+    selectIndex = _enumToInt(channel)
+
+    if not (verifyWrites if verify is None else verify):
+        sendCommand(command="Channel/SetIndex", parameters={"SelectIndex": selectIndex})
+        return channel
+
+    responses = _sendCommandList([
         sendCommand(command="Channel/SetIndex",
-                            parameters={"SelectIndex": channel})
-    except Exception as e:
-        raise e
+                    parameters={"SelectIndex": selectIndex}, batch=True),
+        sendCommand(command="Channel/GetIndex", batch=True)
+    ])
 
-    return getChannel()
+    return responses[-1]["SelectIndex"]
 
 
 def screenOn():
@@ -1049,7 +2279,7 @@ def screenOff():
     return setScreenState(state=False)
 
 
-def setScreenState(state: Screen | bool):
+def setScreenState(state: Screen | bool, verify: bool = None):
     """
     Turn the screen on or off
 
@@ -1065,6 +2295,8 @@ def setScreenState(state: Screen | bool):
             Turns the screen on
         Screen.OFF | False : int | bool
             Turns the screen off 
+    verify : bool
+        If true, read the screen state back from the device to confirm the change was made. Defaults to verifyWrites
 
     Returns
     -------
@@ -1075,14 +2307,15 @@ def setScreenState(state: Screen | bool):
 
     """
 
-    try:
-        sendCommand(command="Channel/OnOffScreen",
-                            parameters={"OnOff": int(state)})
-        state = getSettings()
-    except Exception as e:
-        raise e
+    onOff = _enumToInt(state)
+
+    if not (verifyWrites if verify is None else verify):
+        sendCommand(command="Channel/OnOffScreen", parameters={"OnOff": onOff})
+        return bool(onOff)
+
+    settings = _setAndGetSettings(command="Channel/OnOffScreen", parameters={"OnOff": onOff})
 
-    return bool(int(state["LightSwitch"]))
+    return bool(settings["LightSwitch"])
 
 
 def setLatLong(latitude: float, longitude: float):
@@ -1107,11 +2340,8 @@ def setLatLong(latitude: float, longitude: float):
         Returns an exception if the API or the request returned an error
     """
 
-    try:
-        sendCommand(command="Sys/LogAndLat",
-                            parameters={"Latitude": latitude, "Longitude": longitude})
-    except Exception as e:
-        raise e
+    sendCommand(command="Sys/LogAndLat",
+                        parameters={"Latitude": latitude, "Longitude": longitude})
 
     return {"Latitude": latitude, "Longitude": longitude}
 
@@ -1153,11 +2383,14 @@ def getWeather():
         Returns an exception if the API or the request returned an error
     """
 
-    try:
-        weather = sendCommand(command="Device/GetWeatherInfo")
-        settings = getSettings()
-    except Exception as e:
-        raise e
+    # The weather and the settings are two separate requests, so get the settings from the background worker at the same time.
+    # That worker isn't part of any batch() on this thread, so send anything that's been held back first. It also sends
+    # anything from sendCommand(async_=True) first, so the settings include those changes
+    flush()
+
+    settings = _sendExecutor.submit(getSettings)
+    weather = sendCommand(command="Device/GetWeatherInfo")
+    settings = settings.result()
 
     # Remove the error code, since we already know the call was successful
     del weather["error_code"]
@@ -1196,12 +2429,11 @@ def setTemperatureMode(mode: TemperatureMode = TemperatureMode.CELSIUS.value):
         Returns an exception if the API or the request returned an error
     """
 
-    try:
-        sendCommand(command="Device/SetDisTempMode",
-                            parameters={"Mode": mode})
-        settings = getSettings()
-    except Exception as e:
-        raise e
+    sendCommand(command="Device/SetDisTempMode",
+                        parameters={"Mode": _enumToInt(mode)})
+
+    # Always read the units back from the device, so we're confirming the change we just made
+    settings = getSettings(forceRefresh=True)
 
     return settings["TemperatureMode"]
 
@@ -1228,14 +2460,10 @@ def setCustomPage(page: int):
         Returns an exception if the API or the request returned an error
     """
 
-    try:
-        sendCommand(command="Channel/SetCustomPageIndex",
-                            parameters={"CustomPageIndex": page})
-
-        # TODO: Find a way to get the custom page we're on and return that as confirmation
+    sendCommand(command="Channel/SetCustomPageIndex",
+                        parameters={"CustomPageIndex": page})
 
-    except Exception as e:
-        raise e
+    # TODO: Find a way to get the custom page we're on and return that as confirmation
 
     return page
 
@@ -1260,11 +2488,8 @@ def setClockFace(clockFaceId: int):
         Returns an exception if the API or the request returned an error
     """
 
-    try:
-        sendCommand(command="Channel/SetClockSelectId",
-                            parameters={"ClockId": clockFaceId})
-    except Exception as e:
-        raise e
+    sendCommand(command="Channel/SetClockSelectId",
+                        parameters={"ClockId": clockFaceId})
 
     return clockFaceId
 
@@ -1296,31 +2521,30 @@ def setTimer(time: Timer | int | datetime.datetime | datetime.timedelta, start=T
         Returns an exception if the API or the request returned an error
     """
 
-    # The current date
-    timeNow = datetime.datetime.now()
+    handler = _handlerFor(_timerHandlers, time)
 
-    if isinstance(time, int):
-        # Turns the integer into a timedelta
-        timeObject = datetime.timedelta(seconds=time)
-    elif isinstance(time, Timer):
-        # Turns the named tuple into a timedelta
-        timeObject = datetime.timedelta(
-            minutes=time.minutes, seconds=time.seconds)
-    elif isinstance(time, datetime):
-        # Turns a datetime into a timedelta
-        timeObject = time - timeNow
-    elif isinstance(time, datetime.timedelta):
-        timeObject = time
+    if handler is None:
+        raise Exception("{time} is not a valid timer!".format(time=time))
 
-    try:
-        sendCommand(command="Tools/SetTimer", parameters={
-            "Minute": (timeObject.seconds % 3600) // 60, "Second": timeObject.seconds % 60, "Status": start})
-    except Exception as e:
-        raise e
+    timeObject = handler(time)
+
+    sendCommand(command="Tools/SetTimer", parameters={
+        "Minute": (timeObject.seconds % 3600) // 60, "Second": timeObject.seconds % 60, "Status": start})
 
     return timeObject
 
 
+# How to turn each of the types setTimer accepts into a timedelta
+_timerHandlers = {
+    # The duration in seconds
+    int: lambda time: datetime.timedelta(seconds=time),
+    Timer: lambda time: datetime.timedelta(minutes=time.minutes, seconds=time.seconds),
+    # When the timer should end
+    datetime.datetime: lambda time: time - datetime.datetime.now(),
+    datetime.timedelta: lambda time: time
+}
+
+
 def setStopwatch(start: bool | Status, reset=False):
     """
     Start, stop or reset the stopwatch
@@ -1350,14 +2574,10 @@ def setStopwatch(start: bool | Status, reset=False):
         commands.append(sendCommand(
             command="Tools/SetStopWatch", parameters={"Status": 2}, batch=True))
 
-    try:
-        commands.append(sendCommand(command="Tools/SetStopWatch",
-                                            parameters={"Status": int(start)}, batch=True))
-
-        sendBatchCommands(parameters=commands)
+    commands.append(sendCommand(command="Tools/SetStopWatch",
+                                        parameters={"Status": _enumToInt(start)}, batch=True))
 
-    except Exception as e:
-        raise e
+    sendBatchCommands(parameters=commands)
 
     return True
 
@@ -1384,24 +2604,26 @@ def setScoreboard(redScore: int, blueScore: int):
         Returns an exception if the API or the request returned an error
     """
 
-    try:
-        sendOnlineCommand(command="Tools/SetScoreBoard",
-                          parameters={"BlueScore": blueScore, "RedScore": redScore}, requireDevice=True, requireLogin=True)
-    except Exception as e:
-        raise e
+    sendOnlineCommand(command="Tools/SetScoreBoard",
+                      parameters={"BlueScore": blueScore, "RedScore": redScore}, requireDevice=True, requireLogin=True)
+    _swrInvalidate("getScoreboard")
 
     return {"Red": redScore, "Blue": blueScore}
 
 
-def getScoreboard():
+def getScoreboard(forceRefresh=False):
     """
     Get the scoreboard scores
 
-    Gets the scoreboard scores. Requires a Divoom account
+    Gets the scoreboard scores. Requires a Divoom account. The last result is returned straight away
+    and refreshed in the background if it's more than a second old (see _swr)
 
     Parameters
     ----------
 
+    forceRefresh : bool, optional
+        If True, always waits for the scores from the device. Defaults to False
+
     Returns
     -------
 
@@ -1412,10 +2634,7 @@ def getScoreboard():
 
     """
 
-    try:
-        response = sendCommand(command="Tools/GetScoreBoard")
-    except Exception as e:
-        raise e
+    response = _swr("getScoreboard", lambda forDevice: _getFromDevice(forDevice, "Tools/GetScoreBoard"), forceRefresh=forceRefresh)
 
     return response
 
@@ -1424,9 +2643,8 @@ def reboot():
     """
     Reboot the device
 
-    Reboots the device immediately. 
-
-    TODO: Stop this from waiting, because the app hangs otherwise.
+    Reboots the device immediately. The device usually restarts before it answers,
+    so this only waits a second for a response
 
     Parameters
     ----------
@@ -1441,11 +2659,13 @@ def reboot():
     """
 
     # NOTE: You don't need to actually specify the DeviceId like the API suggests.
+    command = sendCommand(command="Device/SysReboot", batch=True)
 
     try:
-        sendCommand(command="Device/SysReboot")
-    except Exception as e:
-        raise e
+        callPixooAPI(data=command, readTimeout=1)
+    except (RequestsTimeout, RequestsConnectionError):
+        # If the device has gone quiet (or dropped the connection), it's rebooting
+        pass
 
     return True
 
@@ -1470,11 +2690,8 @@ def setVisualizerEQPosition(position: int):
         Returns an exception if the API or the request returned an error
     """
 
-    try:
-        sendCommand(command="Channel/SetEqPosition",
-                            parameters={"EqPosition": position})
-    except Exception as e:
-        raise e
+    sendCommand(command="Channel/SetEqPosition",
+                        parameters={"EqPosition": position})
 
     return True
 
@@ -1502,56 +2719,107 @@ def setCloudChannelCategory(category: CloudChannelCategory | int):
 
     Returns
     -------
-    int
-        The category you set. 0-3, as shown above
-    Exception
-        Returns an exception if the API or the request returned an error
+    int
+        The category you set. 0-3, as shown above
+    Exception
+        Returns an exception if the API or the request returned an error
+    """
+
+    sendCommand(command="Channel/CloudIndex",
+                        parameters={"Index": _enumToInt(category)})
+
+    return True
+
+
+def setNoiseMeter(enabled: Status | bool | int):
+    """
+    Start or stop the noise meter
+
+    Starts or stops the noise meter that shows the noise level in dB
+
+    Parameters
+    ----------
+
+    enabled : Status | int | bool
+        The status of the noise meter. Can be one of:
+
+        Status.STOP : 0
+            Stop the noise meter
+        Status.START : 1
+            Start the noise meter
+
+    Returns
+    -------
+    int
+        Returns the status you passed, as an int
+    Exception
+        Returns an exception if the API or the request returned an error
+    """
+
+    # Convert it once, so we send and return the same value whether we were given a Status, a bool or an int
+    status = _enumToInt(enabled)
+
+    sendCommand(command="Tools/SetNoiseStatus",
+                        parameters={"NoiseStatus": status})
+
+    return status
+
+
+def _encodeFrame(pixels: bytes | bytearray):
+    """
+    Base64 encode a frame
+
+    Base64 encodes the raw RGB data for a frame, ready to be sent as PicData
+
+    Parameters
+    ----------
+
+    pixels : bytes | bytearray
+        The RGB values for the frame, in this format: [R, G, B, R, G, B, ...]
+
+    Returns
+    -------
+
+    str
+        The base64 encoded frame
+
     """
 
-    try:
-        sendCommand(command="Channel/CloudIndex",
-                            parameters={"Index": category})
-    except Exception as e:
-        raise e
+    if pybase64:
+        return pybase64.b64encode_as_string(pixels)
 
-    return True
+    # base64 output is always ASCII, so there's no need to go through the UTF-8 decoder
+    return base64.b64encode(pixels).decode("ascii")
 
 
-def setNoiseMeter(enabled: Status | bool | int):
+def _gammaTable(gamma: float):
     """
-    Start or stop the noise meter
+    Get a gamma correction lookup table
 
-    Starts or stops the noise meter that shows the noise level in dB
+    Gets a lookup table that can be passed to Image.point() to gamma correct an RGB image.
+    Tables are cached, so each one is only built once
 
     Parameters
     ----------
 
-    enabled : Status | int | bool
-        The status of the noise meter. Can be one of:
-
-        Status.STOP : 0
-            Stop the noise meter
-        Status.START : 1
-            Start the noise meter
+    gamma : float
+        The gamma value (e.g. 2.2)
 
     Returns
     -------
-    int
-        Returns the status you passed
-    Exception
-        Returns an exception if the API or the request returned an error
+
+    list[int]
+        A 768 entry lookup table (256 values each for red, green and blue)
+
     """
 
-    try:
-        sendCommand(command="Tools/SetNoiseStatus",
-                            parameters={"NoiseStatus": int(enabled)})
-    except Exception as e:
-        raise e
+    if gamma not in _gammaTables:
+        _gammaTables[gamma] = [round(((value / 255) ** gamma) * 255) for value in range(256)] * 3
 
-    return enabled
+    return _gammaTables[gamma]
 
 
-def _fileToFrames(filename: str, url=False, id=0, resample: Image.Resampling | int = Image.Resampling.BICUBIC.value, size=64, maxFrames=60):
+def _fileToFrames(filename: str, url=False, id=0, resample: "Image.Resampling | int" = None, size=64, maxFrames=60, gamma: float | None = None):
     """
     Convert a file to base64 frames
 
@@ -1571,20 +2839,28 @@ def _fileToFrames(filename: str, url=False, id=0, resample: Image.Resampling | i
     resample : Image.Resampling | int, optional
         If the image is larger than 64px on either side, it's resized. This is 
         the resampling mode that is used. Defaults to bicubic 
+    gamma : float | None, optional
+        If set, gamma corrects each frame (e.g. 2.2) before it's encoded. Defaults to None (no correction)
 
-    Returns
-    -------
-    list
-        A list, containing RGB values in this format:
+    Yields
+    ------
+    GIFData
+        Each frame in turn, with the RGB values base64 encoded in this format:
         [R, G, B, R, G, B, R, G, B, R, G, B, ...]
+        Frames are converted as they're asked for, so the first frame can be sent while the rest are still being converted
     Exception
         Returns an exception if this fails.
     """
 
-    frames = []
+    # Pillow takes a while to import, so it's only imported when it's needed
+    from PIL import Image
+
+    if resample is None:
+        resample = Image.Resampling.BICUBIC.value
 
     if url:
-        file = request(method="get", url=filename)
+        # Download it over the online session, so downloading several files reuses the same connection
+        file = _online_session.get(url=filename, timeout=(connectTimeout, timeout))
         img = Image.open(BytesIO(file.content))
     else:
         img = Image.open(filename)
@@ -1597,6 +2873,9 @@ def _fileToFrames(filename: str, url=False, id=0, resample: Image.Resampling | i
     else:
         totalFrames = img.n_frames
 
+    # Frames that don't fill the screen once they've been shrunk are pasted into the middle of this, instead of making a new image for each one
+    canvas = None
+
     # Loop through all the frames in the animation
     for frame in range(0, totalFrames):
         # Go the frame in question
@@ -1605,31 +2884,95 @@ def _fileToFrames(filename: str, url=False, id=0, resample: Image.Resampling | i
         # Convert it to RGB because the device expects a list of red, green and blue pixels
         imgrgb = img.convert(mode="RGB")
 
-        if imgrgb.size[0] > size or imgrgb.size[1] > size:
+        # Frames that are already the right size (e.g. 64x64 GIFs) are used as they are
+        width, height = imgrgb.size
+
+        if width > size or height > size:
             imgrgb.thumbnail(size=(size, size), resample=resample)
-            imgrgb = ImageOps.pad(image=imgrgb, size=(size, size))
 
-        if "duration" in img.info:
+            # Square images fill the whole screen once they've been shrunk, so only pad the ones that don't.
+            # This centres the frame on a black background, the same as ImageOps.pad
+            if imgrgb.size != (size, size):
+                if canvas is None:
+                    canvas = Image.new("RGB", (size, size))
+                else:
+                    canvas.paste((0, 0, 0), (0, 0, size, size))
+
+                canvas.paste(imgrgb, (round((size - imgrgb.size[0]) / 2), round((size - imgrgb.size[1]) / 2)))
+                imgrgb = canvas
+
+        if gamma:
+            imgrgb = imgrgb.point(_gammaTable(gamma))
+
+        # A single frame is shown until something else is sent, so it doesn't need a duration
+        if totalFrames == 1:
+            duration = 0
+        elif "duration" in img.info:
             duration = int(img.info["duration"])
         else:
             duration = 1000
 
-        # Pillow has a nice feature to get all the RGB values for an image.
-        # We just need to flatten it from a list of tuples to a list, which we do below
-        pixels = [item for p in list(
-            imgrgb.getdata()) for item in p]
-
-        # Base64 encode the pixels we grabbed from the frame
-        b64 = base64.b64encode(bytearray(pixels))
+        # Pillow can give us the RGB values for an image as raw bytes ([R, G, B, R, G, B, ...]),
+        # which is exactly what the device wants, so there's no need to flatten the pixels ourselves
+        pixels = imgrgb.tobytes()
 
         # Build up our frame data command. We can get the frame duration from the GIF.
-        frames.append(GIFData(
-            totalFrames=totalFrames, size=imgrgb.size[0], offset=frame, id=id, speed=duration, data=b64.decode("utf-8")))
+        yield GIFData(
+            totalFrames=totalFrames, size=imgrgb.size[0], offset=frame, id=id, speed=duration, data=_encodeFrame(pixels))
+
+
+def _cachedFileToFrames(filename: str, id=0, gamma: float | None = None):
+    """
+    Convert a local file to base64 frames, reusing frames we've already converted
+
+    Same as _fileToFrames, except that the frames for the last frameCacheSize files are kept.
+    If the file hasn't changed since it was last converted (going by when it was modified and its size),
+    the kept frames are used instead
+
+    Parameters
+    ----------
+
+    filename : str
+        The file to convert
+    id : int, optional
+        The ID of this animation. Used with sendGIF. Defaults to 0
+    gamma : float | None, optional
+        If set, gamma corrects each frame. See _fileToFrames. Frames are kept separately for each gamma value
+
+    Yields
+    ------
+    GIFData
+        Each frame in turn. See _fileToFrames
+
+    """
+
+    stat = os.stat(filename)
+    key = (filename, stat.st_mtime_ns, stat.st_size, gamma)
+
+    frames = _frameCache.get(key)
+
+    if frames is not None:
+        _frameCache.move_to_end(key)
 
-    return frames
+        for frame in frames:
+            yield frame if frame.id == id else frame._replace(id=id)
 
+        return
 
-def sendGIF(type: GIFType | int, filename: str | GIFData):
+    # Pass each frame on as it's converted, so the first frame can be sent straight away, and keep it once they've all been converted
+    frames = []
+
+    for frame in _fileToFrames(filename=filename, id=id, gamma=gamma):
+        frames.append(frame)
+        yield frame
+
+    _frameCache[key] = frames
+
+    while len(_frameCache) > frameCacheSize:
+        _frameCache.popitem(last=False)
+
+
+def sendGIF(type: GIFType | int, filename: str | GIFData, gamma: float | None = None):
     """
     Play a GIF on the device
 
@@ -1677,6 +3020,9 @@ def sendGIF(type: GIFType | int, filename: str | GIFData):
             longer than other frames. You can use `img.info["duration"]` to get the duration of a frame
         GIFData.totalFrames : int
             The amount of frames you have in your GIF. If set to 1, each frame will play as it arrives, and won't loop
+    gamma : float | None, optional
+        If set, gamma corrects each frame (e.g. 2.2) before it's sent, which can make images look closer to how they
+        do on a monitor. Only works with GIFType.LOCALFILE and GIFType.URLDATA. Defaults to None (no correction)
 
     Returns
     -------
@@ -1686,50 +3032,186 @@ def sendGIF(type: GIFType | int, filename: str | GIFData):
         Returns an exception if the API or the request returned an error
     """
 
-    match type:
-        case GIFType.DATA.value:
-            return sendCommand(command="Draw/SendHttpGif", parameters={
-                "PicNum": filename.totalFrames,
-                "PicWidth": filename.size,
-                "PicOffset": filename.offset,
-                "PicID": filename.id,
-                "PicSpeed": filename.speed,
-                "PicData": filename.data
-            })
-
-        case GIFType.LOCALFILE.value | GIFType.URLDATA.value:
-
-            # Reset the GIF IDs so we can just send an ID of 1 and it'll work.
-            resetGIFID()
-
-            # If we've just given a filename, instead of a list of filenames,
-            # wrap it in a list.
-            if isinstance(filename, str):
-                filename = [filename]
-
-            # Loop through all the files that have been passed in
-            for file in range(0, len(filename)):
-                # Convert each file into a set of Pixoo compatible frames
-                # Also check if we're calling a URL.
-                frames = _fileToFrames(
-                    filename=filename[file], id=file, url=(type == GIFType.URLDATA.value))
-
-                # Loop through all the framedata we received back from the conversaion
-                for frame in range(0, len(frames)):
-                    # Send each frame
-                    sendGIF(type=GIFType.DATA.value,
-                            filename=frames[frame])
-
-        case GIFType.SDFILE.value | GIFType.SDFOLDER.value | GIFType.URL.value:
-            sendCommand(command="Device/PlayTFGif", parameters={
-                "FileName": filename,
-                "FileType": type
-            })
+    handler = _gifHandlers.get(type)
+
+    if handler is None:
+        raise Exception("{type} is not a valid GIF type!".format(type=type))
+
+    # Only the frames we convert ourselves can be gamma corrected
+    if handler is _sendGIFFiles:
+        return handler(type, filename, gamma=gamma)
+
+    if gamma is not None:
+        raise Exception("gamma can only be used with GIFType.LOCALFILE and GIFType.URLDATA!")
+
+    return handler(type, filename)
+
+
+def _sendGIFData(type: int, filename: GIFData):
+    """
+    Send a single GIF frame
+
+    Sends one frame of a GIF to the device. Used by sendGIF for GIFType.DATA
+
+    Parameters
+    ----------
+
+    type : int
+        The type of GIF. Always GIFType.DATA
+    filename : GIFData
+        The frame to send. See sendGIF for details
+
+    Returns
+    -------
+
+    dict
+        The response from the device
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    _swrInvalidate("getGIFID")
+
+    return sendCommand(command="Draw/SendHttpGif", parameters=_gifFrameParameters(filename))
+
+
+def _sendGIFFiles(type: int, filename: str | list[str], gamma: float | None = None):
+    """
+    Send local or downloaded files as GIFs
+
+    Converts one or more files (or URLs) into frames, and sends them to the device.
+    Used by sendGIF for GIFType.LOCALFILE and GIFType.URLDATA
+
+    Parameters
+    ----------
+
+    type : int
+        The type of GIF. GIFType.URLDATA downloads each file first
+    filename : str | list[str]
+        The file or URL to send, or a list of them. See sendGIF for details
+    gamma : float | None, optional
+        If set, gamma corrects each frame. See sendGIF for details
+
+    Returns
+    -------
+
+    bool
+        Returns True to indicate that the frames were sent without issue
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    # Reset the GIF IDs so we can just send an ID of 1 and it'll work.
+    resetGIFID()
+
+    # If we've just given a filename, instead of a list of filenames,
+    # wrap it in a list.
+    if isinstance(filename, str):
+        filename = [filename]
+
+    # Loop through all the files that have been passed in
+    for file in range(0, len(filename)):
+        # Convert each file into a set of Pixoo compatible frames
+        # Also check if we're calling a URL.
+        if type == GIFType.URLDATA.value:
+            frames = _fileToFrames(filename=filename[file], id=file, url=True, gamma=gamma)
+        else:
+            frames = _cachedFileToFrames(filename=filename[file], id=file, gamma=gamma)
+
+        # Draw/CommandList can't be used to send frames (see NOTES.md), so each frame is its own request.
+        # The background worker sends them in order over the kept-alive connection, while we convert the next frame.
+        # The worker isn't part of any batch() on this thread, so send anything that's been held back (like the reset) first
+        flush()
+
+        sent = [_sendExecutor.submit(callPixooAPI, data=sendCommand(command="Draw/SendHttpGif", parameters=_gifFrameParameters(frame), batch=True))
+                for frame in frames]
+
+        _swrInvalidate("getGIFID")
+
+        # Raise the first error (if any) that came back from the device
+        for result in sent:
+            result.result()
+
+    return True
+
+
+def _sendGIFFromSD(type: int, filename: str):
+    """
+    Play a GIF the device can get to itself
+
+    Tells the device to play a GIF from the SD card, a folder on the SD card, or a URL.
+    Used by sendGIF for GIFType.SDFILE, GIFType.SDFOLDER and GIFType.URL
+
+    Parameters
+    ----------
+
+    type : int
+        The type of GIF
+    filename : str
+        The filename, folder or URL to play
+
+    Returns
+    -------
+
+    bool
+        Returns True to indicate that the GIF was sent without issue
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    sendCommand(command="Device/PlayTFGif", parameters={
+        "FileName": filename,
+        "FileType": type
+    })
 
     return True
 
 
-def getGIFID():
+# How to send each type of GIF sendGIF accepts
+_gifHandlers = {
+    GIFType.DATA.value: _sendGIFData,
+    GIFType.LOCALFILE.value: _sendGIFFiles,
+    GIFType.URLDATA.value: _sendGIFFiles,
+    GIFType.SDFILE.value: _sendGIFFromSD,
+    GIFType.SDFOLDER.value: _sendGIFFromSD,
+    GIFType.URL.value: _sendGIFFromSD
+}
+
+
+def _gifFrameParameters(frame: GIFData):
+    """
+    Get the Draw/SendHttpGif parameters for a frame
+
+    Turns a GIFData frame into the parameters that Draw/SendHttpGif expects
+
+    Parameters
+    ----------
+
+    frame : GIFData
+        The frame to send. See sendGIF for details
+
+    Returns
+    -------
+
+    dict
+        The parameters for Draw/SendHttpGif
+
+    """
+
+    return {
+        "PicNum": frame.totalFrames,
+        "PicWidth": frame.size,
+        "PicOffset": frame.offset,
+        "PicID": frame.id,
+        "PicSpeed": frame.speed,
+        "PicData": frame.data
+    }
+
+
+def getGIFID(forceRefresh=False):
     """
     Get the GIF ID
 
@@ -1740,9 +3222,13 @@ def getGIFID():
 
     TODO: Need to work out if sending a GIF with the same ID (without resetting) will overwrite or ignore
 
+    The last result is returned straight away and refreshed in the background if it's more than a second old (see _swr)
+
     Parameters
     ----------
 
+    forceRefresh : bool, optional
+        If True, always waits for the ID from the device. Defaults to False
 
     Returns
     -------
@@ -1751,10 +3237,7 @@ def getGIFID():
     Exception
         Returns an exception if the API or the request returned an error
     """
-    try:
-        id = sendCommand(command="Draw/GetHttpGifId")
-    except Exception as e:
-        raise e
+    id = _swr("getGIFID", lambda forDevice: _getFromDevice(forDevice, "Draw/GetHttpGifId"), forceRefresh=forceRefresh)
 
     return id
 
@@ -1781,15 +3264,46 @@ def resetGIFID():
         Returns an exception if the API or the request returned an error
     """
 
-    try:
-        sendCommand(command="Draw/ResetHttpGifId")
-    except Exception as e:
-        raise e
+    sendCommand(command="Draw/ResetHttpGifId")
+    _swrInvalidate("getGIFID")
 
     return 0
 
 
-def drawText(options: List[TextOptions]):
+# How long (in seconds) drawText waits for more text before sending it all in one request. 0 sends it straight away
+textDebounce = 0.0
+
+# Text drawText is waiting to send, keyed by text ID, and the timer that will send it. See _queueText()
+_pendingText: dict[int, dict] = {}
+_pendingTextTimer: threading.Timer | None = None
+_pendingTextLock = threading.Lock()
+
+# What drawText sends for any text options that haven't been set
+_textDefaults = {
+    "type": TextType.TEXT.value,
+    "dir": TextDirection.LEFT.value,
+    "font": 2,
+    "Textheight": 16,
+    "speed": 10,
+    "align": TextAlignment.LEFT.value
+}
+
+# The name the device uses for each of the text options drawText takes
+_textOptionKeys = {
+    "id": "TextId",
+    "type": "type",
+    "x": "x",
+    "y": "y",
+    "direction": "dir",
+    "font": "font",
+    "width": "TextWidth",
+    "text": "TextString",
+    "align": "align",
+    "colour": "color"
+}
+
+
+def drawText(options: list[TextOptions]):
     """
     Send text to the device
 
@@ -1801,7 +3315,7 @@ def drawText(options: List[TextOptions]):
     text : str, optional
         The text to display if using TextType.URL or TextType.TEXT
 
-    options : List[TextOptions]
+    options : list[TextOptions]
         A list of text options. TextOptions consists of:
 
         id : int
@@ -1892,86 +3406,338 @@ def drawText(options: List[TextOptions]):
 
     Returns
     -------
-    list
-        Returns a list of text IDs (e.g. [1, 2, 3] if you send 3 bits of text)
-    Exception
-        Returns an exception if the API or the request returned an error
+    list
+        Returns a list of text IDs (e.g. [1, 2, 3] if you send 3 bits of text)
+        If textDebounce is set, the text is sent up to textDebounce seconds later along with any
+        other text drawn in the meantime. Call flushText() to send it straight away
+    Exception
+        Returns an exception if the API or the request returned an error
+    """
+
+    if not isinstance(options, list):
+        options = [options]
+
+    # Options can be TextOptions or plain dicts (like in the README), so turn them all into dicts
+    options = [option._asdict() if isinstance(option, TextOptions) else option for option in options]
+
+    # Start from the defaults, then rename each option that's been set to what the device calls it.
+    # Options set to None get the default, but 0 (e.g. font 0) is kept. Enums (e.g. TextDirection.LEFT) are sent as their values
+    textPackets = [{**_textDefaults, **{_textOptionKeys[key]: value.value if isinstance(value, Enum) else value
+                                        for key, value in option.items() if value is not None and key in _textOptionKeys}}
+                   for option in options]
+
+    if textDebounce > 0:
+        _queueText(textPackets)
+    else:
+        sendCommand(command="Draw/SendHttpItemList",
+                    parameters={"ItemList": textPackets})
+
+    return [option["id"] for option in options]
+
+
+def _queueText(textPackets: list[dict]):
+    """
+    Queue text to be sent
+
+    Holds text back so that text drawn close together (e.g. the hours, minutes and seconds of a clock)
+    goes to the device in one request. The text is sent textDebounce seconds after the first lot was queued,
+    or straight away once 16 bits of text are waiting. Newer text with the same ID replaces the older text
+
+    Parameters
+    ----------
+
+    textPackets : list[dict]
+        The text, as built by drawText
+
+    Returns
+    -------
+
+    bool
+        Returns True once the text has been queued (or sent)
+
+    """
+
+    global _pendingTextTimer
+
+    with _pendingTextLock:
+        for packet in textPackets:
+            _pendingText[packet["TextId"]] = packet
+
+        full = len(_pendingText) >= 16
+
+        # Only start the timer for the first lot, so text doesn't wait any longer than textDebounce
+        if not full and _pendingTextTimer is None:
+            _pendingTextTimer = threading.Timer(textDebounce, flushText)
+            _pendingTextTimer.daemon = True
+            _pendingTextTimer.start()
+
+    if full:
+        flushText()
+
+    return True
+
+
+def flushText():
+    """
+    Send any text that's waiting to be sent
+
+    If textDebounce is set, drawText holds text back for a little while. This sends it straight away
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+
+    bool
+        Returns True once the text has been sent
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    global _pendingTextTimer
+
+    with _pendingTextLock:
+        if _pendingTextTimer is not None:
+            _pendingTextTimer.cancel()
+            _pendingTextTimer = None
+
+        textPackets = list(_pendingText.values())
+        _pendingText.clear()
+
+    if textPackets:
+        sendCommand(command="Draw/SendHttpItemList",
+                    parameters={"ItemList": textPackets})
+
+    return True
+
+
+# Send any text that drawText is still holding back before Python exits
+atexit.register(flushText)
+
+
+def divoomLogin(email: str, password: str, alreadyHashed: bool = False, forceRefresh: bool = False):
+    """
+    Login to the Divoom API
+
+    The Pixoo uses two APIs, the local one, and one offered through appin.divoom-gz.com. This method
+    logs in to the Divoom website. You can only log in using a regular account, and not an account
+    created using Facebook or Twitter.
+
+    Parameters
+    ----------
+    email : str
+        The email address you signed up with
+    password : str
+        Your password. Will be MD5 hashed before sending
+    alreadyHashed : bool
+        If true, then your password will NOT be MD5 hashed before sending, as it assumes
+        that you've already hashed it prior to calling this method. 
+    forceRefresh : bool
+        If true, always logs in again, even if you've logged in with the same details in the last loginTTL seconds
+        (in this script, or in stateFile if it's set)
+
+    Returns
+    -------
+    User | dict
+        Returns a dict which has your Token and your UserId in it
+    Exception
+        Returns an exception if the API or the request returned an error
+    """
+
+    # Hash our password if it wasn't supplied to us as a hash already
+    if not alreadyHashed:
+        import hashlib
+
+        password = hashlib.md5(password.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+    global user
+
+    # If we've logged in with these details recently, just reuse that login
+    cached = _loginCache.get((email, password))
+
+    if not forceRefresh and cached and time.monotonic() - cached[0] < loginTTL:
+        user = cached[1]
+
+        return user
+
+    # If another run of this script logged in recently, reuse that login
+    saved = None if forceRefresh else _loadLogin(email, password)
+
+    if saved:
+        user = saved
+        _loginCache[(email, password)] = (time.monotonic(), user)
+
+        return user
+
+    response = sendOnlineCommand(command="UserLogin", parameters={
+        "Email": email,
+        "Password": password
+    }, requireDevice=False, requireLogin=False)
+
+    user = DivoomUser(Token=response["Token"], UserId=response["UserId"])
+    _loginCache[(email, password)] = (time.monotonic(), user)
+    _saveLogin(email, password, user)
+
+    return user
+
+
+def _stateKey(email: str, password: str):
+    """
+    Get the key a login is saved under in stateFile
+
+    Logins are saved under a SHA-256 of the email and hashed password, so neither of them ends up in the file
+
+    Parameters
+    ----------
+
+    email : str
+        The email address
+    password : str
+        The MD5 hashed password
+
+    Returns
+    -------
+
+    str
+        The key
+
     """
 
-    if not isinstance(options, List):
-        options = [options]
+    import hashlib
+
+    return hashlib.sha256("{email}\n{password}".format(email=email, password=password).encode("utf-8")).hexdigest()
+
+
+def _readState():
+    """
+    Read stateFile
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+
+    dict
+        What's in stateFile, or an empty dict if it isn't set, doesn't exist or can't be read
 
-    textPackets = []
-    for option in options:
-        # option = defaultdict(lambda:None, option)
-        textPackets.append({
-            "TextId": option["id"],
-            "type": option["type"] or TextType.TEXT.value,
-            "x": option["x"],
-            "y": option["y"],
-            "dir": option["direction"] or TextDirection.LEFT.value,
-            "font": option["font"] or 2,
-            "TextWidth": option["width"],
-            "TextString": option["text"],
-            "Textheight": 16,
-            "speed": 10,
-            "align": option["align"] or TextAlignment.LEFT.value,
-            "color": option["colour"]
-        })
+    """
+
+    if not stateFile:
+        return {}
 
     try:
-        sendCommand(command="Draw/SendHttpItemList",
-                            parameters={"ItemList": textPackets})
-    except Exception as e:
-        raise e
+        with open(os.path.expanduser(stateFile), "rb") as file:
+            return _decodeJSON(file.read())
+    except (OSError, ValueError):
+        return {}
 
-    return [option["id"] for option in options]
 
+def _writeState(state: dict):
+    """
+    Write stateFile
+
+    Writes to a temporary file first, then moves it over stateFile, so that two scripts writing at the same time
+    can't leave a half-written file behind. Only you can read the file, as it holds your login token
+
+    Parameters
+    ----------
+
+    state : dict
+        What to put in stateFile
+
+    Returns
+    -------
+
+    bool
+        True if stateFile was written, False if it isn't set or couldn't be written
 
-def divoomLogin(email: str, password: str, alreadyHashed: bool = False):
     """
-    Login to the Divoom API
 
-    The Pixoo uses two APIs, the local one, and one offered through appin.divoom-gz.com. This method
-    logs in to the Divoom website. You can only log in using a regular account, and not an account
-    created using Facebook or Twitter.
+    if not stateFile:
+        return False
+
+    path = os.path.expanduser(stateFile)
+    temporary = "{path}.{pid}.tmp".format(path=path, pid=os.getpid())
+
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        with open(os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as file:
+            file.write(_dumpJSON(state))
+
+        os.replace(temporary, path)
+    except OSError:
+        return False
+
+    return True
+
+
+def _loadLogin(email: str, password: str):
+    """
+    Load a login from stateFile
 
     Parameters
     ----------
+
     email : str
-        The email address you signed up with
+        The email address
     password : str
-        Your password. Will be MD5 hashed before sending
-    alreadyHashed : bool
-        If true, then your password will NOT be MD5 hashed before sending, as it assumes
-        that you've already hashed it prior to calling this method. 
+        The MD5 hashed password
 
     Returns
     -------
-    User | dict
-        Returns a dict which has your Token and your UserId in it
-    Exception
-        Returns an exception if the API or the request returned an error
+
+    DivoomUser | None
+        The user, if they logged in less than loginTTL seconds ago. None otherwise
+
     """
 
-    try:
-        # Hash our password if it wasn't supplied to us as a hash already
-        if not alreadyHashed:
-            password = hashlib.md5(bytes(password, "utf-8")).hexdigest()
+    login = _readState().get("logins", {}).get(_stateKey(email, password))
 
-        response = sendOnlineCommand(command="UserLogin", parameters={
-            "Email": email,
-            "Password": password
-        }, requireDevice=False, requireLogin=False)
+    if not login or _now() - login["ts"] >= loginTTL:
+        return None
 
-        global user
+    return DivoomUser(Token=login["Token"], UserId=login["UserId"])
 
-        user = DivoomUser(Token=response["Token"], UserId=response["UserId"])
 
-        return user
+def _saveLogin(email: str, password: str, login: DivoomUser):
+    """
+    Save a login to stateFile
+
+    Parameters
+    ----------
 
-    except Exception as e:
-        raise e
+    email : str
+        The email address
+    password : str
+        The MD5 hashed password
+    login : DivoomUser
+        The user that was logged in
+
+    Returns
+    -------
+
+    bool
+        True if the login was saved, False if stateFile isn't set or couldn't be written
+
+    """
+
+    if not stateFile:
+        return False
+
+    state = _readState()
+    logins = state.setdefault("logins", {})
+
+    # Drop any logins that have expired while we're here
+    for key in [key for key, saved in logins.items() if _now() - saved["ts"] >= loginTTL]:
+        del logins[key]
+
+    logins[_stateKey(email, password)] = {"ts": _now(), "Token": login["Token"], "UserId": login["UserId"]}
+
+    return _writeState(state)
 
 
 def divoomLogout(userID: int, token: int):
@@ -1995,27 +3761,41 @@ def divoomLogout(userID: int, token: int):
         Returns an exception if the API or the request returned an error
     """
 
-    try:
-        sendOnlineCommand(command="UserLogout", requireDevice=False, requireLogin=True)
+    sendOnlineCommand(command="UserLogout", requireDevice=False, requireLogin=True)
+
+    global user
 
-        user = None
+    # The token is no longer valid, so don't let divoomLogin hand it out again
+    _loginCache.clear()
+    user = None
 
-        return True
+    state = _readState()
 
-    except Exception as e:
-        raise e
+    if state.pop("logins", None):
+        _writeState(state)
+
+    return True
+
+
+# The fields we keep from each alarm the API sends back, and a getter that pulls them all out at once
+_alarmKeys = ("AlarmId", "AlarmName", "AlarmTime", "DeviceId", "EnableFlag", "ImageFileId", "RepeatArray")
+_getAlarmFields = itemgetter(*_alarmKeys)
 
 
-def getAlarms():
+def getAlarms(forceRefresh=False):
     """
     Get alarms
 
-    Gets a list of alarms from the device. 
-    Requires you to have logged in to Divoom API using divoomLogin()
+    Gets a list of alarms from the device, and stores them in pixoo.alarms.
+    Requires you to have logged in to Divoom API using divoomLogin(). The last result
+    is returned straight away and refreshed in the background if it's more than a second old (see _swr)
 
     Parameters
     ----------
 
+    forceRefresh : bool, optional
+        If True, always waits for the alarms from the API. Defaults to False
+
     Returns
     -------
     list[Alarm]
@@ -2024,26 +3804,41 @@ def getAlarms():
         Returns an exception if the API or the request returned an error
     """
 
-    try:
-        response = sendOnlineCommand(command="Alarm/Get", requireDevice=True, requireLogin=True)
-        alarms = []
-        for alarm in response["AlarmList"]:
-            alarms.append({
-                "AlarmId": alarm["AlarmId"],
-                "AlarmName": alarm["AlarmName"],
-                "AlarmTime": alarm["AlarmTime"],
-                "DeviceId": alarm["DeviceId"],
-                "EnableFlag": alarm["EnableFlag"],
-                "ImageFileId": alarm["ImageFileId"],
-                "RepeatArray": alarm["RepeatArray"]
-            })
+    return _swr("getAlarms", _fetchAlarms, forceRefresh=forceRefresh)
+
+
+def _fetchAlarms(forDevice: dict):
+    """
+    Fetch alarms
+
+    Gets a list of alarms from the API, and stores them in pixoo.alarms if forDevice is still the current device. Used by getAlarms
+
+    Parameters
+    ----------
+
+    forDevice : dict
+        The device to get the alarms for
+
+    Returns
+    -------
+    list[Alarm]
+        Returns a list of alarms
+    Exception
+        Returns an exception if the API or the request returned an error
+    """
 
-        alarms = alarms
+    global alarms
 
-        return alarms
+    response = sendOnlineCommand(command="Alarm/Get", parameters={"DeviceId": forDevice["DeviceId"]} if forDevice else {},
+                                 requireDevice=True, requireLogin=True)
+    # Only keep the fields that make up an Alarm
+    alarmList = [dict(zip(_alarmKeys, _getAlarmFields(alarm))) for alarm in response["AlarmList"]]
 
-    except Exception as e:
-        raise e
+    # Keep a copy at the module level, so you can look through the alarms without asking the API again
+    if forDevice is device:
+        alarms = alarmList
+
+    return alarmList
 
 
 def setAlarm(time: datetime.time | datetime.timedelta | int | Timer, repeatDays=[0, 0, 0, 0, 0, 0, 0], enabled: bool = True, name="Alarm"):
@@ -2072,44 +3867,42 @@ def setAlarm(time: datetime.time | datetime.timedelta | int | Timer, repeatDays=
     Exception
         Returns an exception if the API or the request returned an error
     """
-    try:
+    handler = _handlerFor(_alarmTimeHandlers, time)
 
-        # If it's an integer, assume it's a timestamp and return that
-        if isinstance(time, int):
-            timeObject = time
-        # If it's a Timer NamedTuple, make it into a timedelta, then into a datetime, then timestamp
-        elif isinstance(time, Timer):
-            timeObject = math.floor((datetime.datetime.now(
-            ) + datetime.timedelta(minutes=time.minutes, seconds=time.seconds)).timestamp())
-        # If it's a datetime, get the timestamp
-        elif isinstance(time, datetime.datetime):
-            timeObject = math.floor(time.timestamp())
-        # If this is a time, make up a date, combine it with the time, then get the timestamp
-        elif isinstance(time, datetime.time):
-            timeObject = math.floor(datetime.datetime.combine(
-                datetime.datetime.now(), time).timestamp())
-        # If it's a timedelta, add it to datetime.now(), then get the timestamp
-        elif isinstance(time, datetime.timedelta):
-            timeObject = math.floor(
-                (datetime.datetime.now() + time).timestamp())
-
-        alarm = {
-            "AlarmId": name,
-            "AlarmName": name,
-            "DeviceId": device["DeviceId"],
-            "EnableFlag": int(enabled),
-            "AlarmTime": timeObject,
-            "ImageFileId": "",
-            "RepeatArray": repeatDays
-        }
+    if handler is None:
+        raise Exception("{time} is not a valid alarm time!".format(time=time))
+
+    timeObject = handler(time)
+
+    alarm = {
+        "AlarmId": name,
+        "AlarmName": name,
+        "DeviceId": device["DeviceId"],
+        "EnableFlag": int(enabled),
+        "AlarmTime": timeObject,
+        "ImageFileId": "",
+        "RepeatArray": repeatDays
+    }
 
-        response = sendOnlineCommand(
-            command="Alarm/Set", parameters=alarm, requireDevice=True, requireLogin=True)
+    response = sendOnlineCommand(
+        command="Alarm/Set", parameters=alarm, requireDevice=True, requireLogin=True)
+    _swrInvalidate("getAlarms")
 
-        return response["AlarmId"]
+    return response["AlarmId"]
 
-    except Exception as e:
-        raise e
+
+# How to turn each of the types setAlarm accepts into a timestamp
+_alarmTimeHandlers = {
+    # If it's an integer, assume it's a timestamp already
+    int: lambda time: time,
+    # If it's a Timer NamedTuple, add the minutes and seconds to the current timestamp
+    Timer: lambda time: int(_now()) + time.minutes * 60 + time.seconds,
+    datetime.datetime: lambda time: math.floor(time.timestamp()),
+    # If this is a time, make up a date, combine it with the time, then get the timestamp
+    datetime.time: lambda time: math.floor(datetime.datetime.combine(datetime.datetime.now(), time).timestamp()),
+    # If it's a timedelta, add it to the current timestamp
+    datetime.timedelta: lambda time: int(_now()) + int(time.total_seconds())
+}
 
 
 def deleteAlarm(id: int | str):
@@ -2132,18 +3925,16 @@ def deleteAlarm(id: int | str):
         Returns an exception if the API or the request returned an error
     """
 
-    try:
-        if id == "all":
-            response = sendOnlineCommand(command="Alarm/DelAll", requireDevice=True, requireLogin=True)
-        else:
-            response = sendOnlineCommand(command="Alarm/Del", parameters={
-                "AlarmId": id
-            }, requireDevice=True, requireLogin=True)
+    if id == "all":
+        response = sendOnlineCommand(command="Alarm/DelAll", requireDevice=True, requireLogin=True)
+    else:
+        response = sendOnlineCommand(command="Alarm/Del", parameters={
+            "AlarmId": id
+        }, requireDevice=True, requireLogin=True)
 
-        return response
+    _swrInvalidate("getAlarms")
 
-    except Exception as e:
-        raise e
+    return response
 
 
 def loadScreenFromFile(file: str):
@@ -2173,36 +3964,93 @@ def loadScreenFromFile(file: str):
     with open(file) as json_file:
         data = json.load(json_file)
 
-        try:
-            # First, send the GIF
-            sendGIF(type=data["type"], filename=data["image"])
+    # First, send the GIF
+    sendGIF(type=data["type"], filename=data["image"])
+
+    # Then send the text
+    drawText(data["text"])
+
+
+def _minutesToTime(minutes: int):
+    """
+    Turn minutes since midnight into a time
+
+    The night mode schedule uses the number of minutes since midnight (e.g. 1380 for 11pm). This turns that into a datetime.time
+
+    Parameters
+    ----------
+
+    minutes : int
+        The number of minutes since midnight
+
+    Returns
+    -------
+
+    datetime.time
+        The time
+
+    """
+
+    # 1440 is midnight at the end of the day, which datetime.time can't hold, so it wraps around to 00:00
+    hours, minutes = divmod(minutes % 1440, 60)
+
+    return datetime.time(hours, minutes, 0)
+
+
+def _timeToMinutes(value: int | datetime.time | None):
+    """
+    Turn a time into minutes since midnight
+
+    The opposite of _minutesToTime. Accepts anything setNightMode accepts for a time
+
+    Parameters
+    ----------
+
+    value : int | datetime.time | None
+        A datetime.time, or a number of minutes since midnight. Anything int-like (e.g. numpy integers) is fine
+
+    Returns
+    -------
 
-            # Then send the text
-            drawText(data["text"])
+    int | None
+        The number of minutes since midnight, or None if value is None
+
+    """
 
-        except Exception as e:
-            raise e
+    if value is None:
+        return None
+    elif isinstance(value, datetime.time):
+        return (value.hour * 60) + value.minute
+    else:
+        return index(value)
 
 
-def getNightMode():
+def getNightMode(asMinutes=False, forceRefresh=False):
     """
     Gets the Night Mode Schedule
 
     Gets the night mode schedule. This is when the screen
-    will dim or brighten
+    will dim or brighten. The schedule is reused for nightModeTTL seconds,
+    or until setNightMode() changes it
 
     Parameters
     ----------
 
+    asMinutes : bool, optional
+        If True, start and end are returned as the number of minutes since midnight (the same as
+        setNightMode accepts) instead of a datetime.time. Defaults to False
+    forceRefresh : bool, optional
+        If true, always asks the online API, even if the schedule was fetched less than nightModeTTL seconds ago
+
     Returns
     -------
 
-    dict
+    NightMode | dict
         Returns a dictionary with a few properties:
 
-        start : datetime.time
+        start : datetime.time | int
             The time the night mode will start
-        end : datetime.time
+        end : datetime.time | int
             The time that the night mode will end
         state : bool
             Whether the night mode is on or off
@@ -2213,25 +4061,27 @@ def getNightMode():
     
     """
 
-    try:
+    global _lastNightMode
+
+    deviceIP = device["DevicePrivateIP"] if device else None
 
+    if not forceRefresh and _nightModeCache["ip"] == deviceIP and time.monotonic() - _nightModeCache["ts"] < nightModeTTL:
+        response = _nightModeCache["data"]
+    else:
         response = sendOnlineCommand(command="Channel/GetNightView", requireDevice=True, requireLogin=True)
+        _nightModeCache.update(ip=deviceIP, ts=time.monotonic(), data=response)
 
-        startTime = response["StartTime"]
-        endTime = response["EndTime"]
+        # The schedule may have been changed somewhere else (e.g. in the app), so setNightMode can't skip sending it any more
+        _lastNightMode = None
 
-        startTimeParts = divmod(startTime, 60)
-        endTimeParts = divmod(endTime, 60)
+    startTime = response["StartTime"]
+    endTime = response["EndTime"]
 
-        return {
-            "start": datetime.time(startTimeParts[0], startTimeParts[1], 0),
-            "end": datetime.time(endTimeParts[0], endTimeParts[1], 0),
-            "state": bool(response["OnOff"]),
-            "brightness": int(response["Brightness"])
-        }
+    if not asMinutes:
+        startTime = _minutesToTime(startTime)
+        endTime = _minutesToTime(endTime)
 
-    except Exception as e:
-        raise e
+    return NightMode(start=startTime, end=endTime, state=bool(response["OnOff"]), brightness=int(response["Brightness"]))
 
 
 def setNightMode(state: bool | int, start: int | datetime.time | None, end: int | datetime.time | None, brightness: int = 50):
@@ -2253,13 +4103,13 @@ def setNightMode(state: bool | int, start: int | datetime.time | None, end: int
     end : int | datetime.time | None
         Similar to start, what time to end night mode.
     brightness : int, optional
-        What brightness to set the screen to during night mode. Defaults to 50
+        What brightness to set the screen to during night mode. Values outside 0 to 100 are clamped. Defaults to 50
 
     Returns
     -------
 
-    dict
-        Returns the night mode schedule as a dictionary
+    NightMode | dict
+        Returns the night mode schedule that was sent, as a dictionary. Use getNightMode() to read it back from the API
 
         Has the fields:
             start : datetime.time
@@ -2270,38 +4120,60 @@ def setNightMode(state: bool | int, start: int | datetime.time | None, end: int
                 If the schedule is active or not.
             brightness : int
                 The brightness, expressed as an integer between 1 and 100
+    ValueError
+        Returns a ValueError if start or end is more than 1440 minutes
     Exception
         Returns an exception if the API or the request returned an error
 
     """
 
-    try:
+    # Turn the times into minutes since midnight once, then check both in one place. Times given as a datetime.time can't be out of range
+    startTime = _timeToMinutes(start)
+    endTime = _timeToMinutes(end)
 
-        if isinstance(start, int) and start > 1440:
-            raise Exception("Start time is greater than 1440 minutes!")
-        elif isinstance(end, int) and end > 1440:
-            raise Exception("End time is greater than 1440 minutes!")
+    for name, value in (("Start", startTime), ("End", endTime)):
+        if value is not None and value > 1440:
+            raise ValueError("{name} time is greater than 1440 minutes!".format(name=name))
 
-        if(start == end):
-            state = False
+    # Night mode is off if there's no start time, or if it starts and ends at the same time.
+    # The device still needs a number for each time, so send midnight for any that are missing
+    onOff = 0 if startTime is None or startTime == endTime else (1 if index(state) else 0)
 
-        if isinstance(start, datetime.time):
-            startTime = (start.hour * 60) + start.minute
+    # Accept anything int-like (e.g. numpy integers) for the brightness, and keep it between 0 and 100
+    brightness = index(brightness)
+    brightness = 0 if brightness < 0 else 100 if brightness > 100 else brightness
 
-        if isinstance(end, datetime.time):
-            endTime = (end.hour * 60) + end.minute
+    startTime = startTime or 0
+    endTime = endTime or 0
 
-        sendOnlineCommand(command="Channel/SetNightView", parameters={
-            "StartTime": startTime,
-            "EndTime": endTime,
-            "OnOff": int(state),
-            "Brightness": brightness
-        }, requireDevice=True, requireLogin=True)
+    global _lastNightMode
+
+    # If this is the same schedule we sent to this device less than nightModeTTL seconds ago, there's no need to send it again.
+    # After that, it might have been changed somewhere else (e.g. in the Divoom app), so send it anyway
+    schedule = (device["DevicePrivateIP"] if device else None, startTime, endTime, onOff, brightness)
+
+    if _lastNightMode is not None and _lastNightMode[0] == schedule and time.monotonic() - _lastNightMode[2] < nightModeTTL:
+        return NightMode(_lastNightMode[1])
+
+    sendOnlineCommand(command="Channel/SetNightView", parameters={
+        "StartTime": startTime,
+        "EndTime": endTime,
+        "OnOff": onOff,
+        "Brightness": brightness
+    }, requireDevice=True, requireLogin=True)
+
+    # The schedule getNightMode() has is out of date now
+    _nightModeCache["ts"] = 0.0
 
-        return getNightMode()
+    # The API doesn't change the schedule it's given, so there's no need to ask for it back
+    result = NightMode(start=_minutesToTime(startTime), end=_minutesToTime(endTime), state=bool(onOff), brightness=brightness)
+
+    # Inside batch(), the schedule has only been held back, and might never be sent (e.g. if the batch fails), so don't skip it next time
+    if not _isBatching():
+        _lastNightMode = (schedule, result, time.monotonic())
+
+    return NightMode(result)
 
-    except Exception as e:
-        raise e
 
 def getUserImages(userId: int, results = 2000):
     """
@@ -2335,17 +4207,15 @@ def getUserImages(userId: int, results = 2000):
 
     """
 
-    try:
-        results = sendOnlineCommand("GetSomeoneListV2", {
-            "SomeOneUserId": userId,
-            "StartNum": 1,
-            "EndNum": 2000,
-        }, requireDevice=False, requireLogin=False)
-
-        return {key: results["FileList"][key] for key in ("FileName", "FileId")}
+    response = sendOnlineCommand("GetSomeoneListV2", {
+        "SomeOneUserId": userId,
+        "StartNum": 1,
+        "EndNum": results,
+    }, requireDevice=False, requireLogin=False)
 
-    except Exception as e:
-        raise e
+    # FileList is a list of dicts (one per image), so pull the fields we want out of each one in a single pass
+    return [{"FileId": image["FileId"], "FileName": image["FileName"], "Date": image.get("Date")}
+            for image in response["FileList"]]
     
 
 def downloadOnlineGIF(fileId: str, outFile = None):
@@ -2373,25 +4243,87 @@ def downloadOnlineGIF(fileId: str, outFile = None):
 
     """
 
-    try:
-        # Call the Pixoo API to get the file
-        data = sendOnlineCommand("Cloud/GetFileData", { "FileId": fileId }, requireDevice=False, requireLogin=False)
+    # Call the Pixoo API to get the file
+    data = sendOnlineCommand("Cloud/GetFileData", { "FileId": fileId }, requireDevice=False, requireLogin=False)
 
-        # If there's no data, then the FileId is valid, but the image is private
-        # or has had the flag set so nobody can edit / remix it.
-        if len(data["FileData"]) == 0:
-            raise Exception("No file data! Image may be set to private")
-        
-        if outFile == None:
-            if data["FileName"]:
-                outFile = data["FileName"]
-            else:
-                outFile = "image.gif"
+    # If there's no data, then the FileId is valid, but the image is private
+    # or has had the flag set so nobody can edit / remix it.
+    if len(data["FileData"]) == 0:
+        raise Exception("No file data! Image may be set to private")
+
+    # The API sends the pixels as a list of ints, so make that bytes once here and every frame can be sliced out of it directly
+    if not isinstance(data["FileData"], (bytes, bytearray)):
+        data["FileData"] = bytes(data["FileData"])
+    
+    if outFile == None:
+        if data["FileName"]:
+            outFile = data["FileName"]
+        else:
+            outFile = "image.gif"
+
+    _imageDataToGIF(data, outFile)
+
+    return os.path.abspath(outFile)
+
+
+async def downloadOnlineGIFAsync(fileId: str, outFile = None):
+    """
+    Create a GIF from a Divoom file URL without blocking the event loop
+
+    Same as downloadOnlineGIF, but can be awaited. The download and the conversion run on a worker thread,
+    and no more than asyncConcurrency run at once. See sendCommandAsync for details
+
+    Parameters
+    ----------
+
+    fileId : str
+        The file ID of the image
+    outFile : str | None
+        Where to save this image on disk. If not specified, will attempt to use the filename from Divoom, otherwise will default to image.gif
+
+    Returns
+    -------
+    str
+        Returns the full path to the file
+    Exception
+        Returns an exception if the API or the request returned an error
+
+    """
+
+    async with _asyncSemaphore():
+        return await asyncio.to_thread(downloadOnlineGIF, fileId=fileId, outFile=outFile)
+
+
+async def downloadOnlineGIFs(fileIds: list, outFiles: list = None):
+    """
+    Create GIFs from a list of Divoom file URLs at the same time
+
+    Downloads and converts each file with downloadOnlineGIFAsync, so that while one file is being converted,
+    the next ones are already downloading. Useful for saving the images returned by getUserImages
+
+    Parameters
+    ----------
+
+    fileIds : list
+        The file IDs of the images
+    outFiles : list | None
+        Where to save each image on disk, in the same order as fileIds. If not specified, the filename from Divoom is used for each one.
+        Make sure these are different, otherwise images will overwrite each other
+
+    Returns
+    -------
+    list
+        Returns the full path to each file, in the same order as fileIds
+    Exception
+        Returns the first exception if the API or any of the requests returned an error
+
+    """
+
+    if outFiles is None:
+        outFiles = [None] * len(fileIds)
 
-        _imageDataToGIF(data, data["Filename"])
+    return await asyncio.gather(*(downloadOnlineGIFAsync(fileId, outFile) for fileId, outFile in zip(fileIds, outFiles)))
 
-    except Exception as e:
-        raise e
 
 def _imageDataToGIF(data: dict, outFile = "image.gif"):
     """
@@ -2400,49 +4332,93 @@ def _imageDataToGIF(data: dict, outFile = "image.gif"):
 
     """
 
-    try:
-        # What will the size of the chunks be?
-        # This is the length of the data, divided by the number of frames
-        chunkSize = int((len(data["FileData"]) / int(data["PicCount"])))
-        
-        # This holds our constructed frames
-        images = []
+    # Pillow takes a while to import, so it's only imported when it's needed
+    from PIL import Image
+
+    # The data is already [R, G, B, R, G, B, ...], which is what Pillow's raw decoder wants, so each frame can be made
+    # straight from its chunk instead of building a tuple for each pixel. The online API sends a list of ints, so make that bytes first
+    fileData = bytes(data["FileData"])
+    # Slicing a memoryview doesn't copy, so each frame is read straight out of fileData
+    fileView = memoryview(fileData)
+
+    # What will the size of the chunks be?
+    # This is the length of the data, divided by the number of frames
+    chunkSize = len(fileData) // int(data["PicCount"])
+
+    # Work out the frame size. This is just the square root of the number of pixels in a chunk
+    # For example if a chunk has 4096 pixels in it, the square root of that is 64, so our size is 64x64
+    frameSize = math.isqrt(chunkSize // 3)
+    size = (frameSize, frameSize)
+    frameBytes = frameSize * frameSize * 3
+
+    if frameBytes == 0:
+        raise Exception("No frames in the image data!")
+
+    # Most of the time spent saving a GIF goes on turning each frame into a palette image. The frames don't depend on
+    # each other and Pillow lets go of the GIL while it converts them, so convert them all at the same time, in order.
+    # This is the same conversion the GIF writer would have done, so the file comes out the same
+    images = list(_convertExecutor.map(
+        lambda start: Image.frombytes("RGB", size, fileView[start:start + frameBytes]).convert("P", palette=Image.Palette.ADAPTIVE),
+        range(0, len(fileData) - frameBytes + 1, chunkSize)))
+
+    # And now use the first frame to save all of the subsequent frames as a GIF
+    images[0].save(outFile, format="GIF", append_images=images[1:],
+           save_all=True, duration=data["Speed"], loop=0)
+
+
+# The headers of the Divoom file types that _binFileToGIF reads, compiled once instead of on every file
+_staticImageHeader = Struct(">BBI")
+_animatedImageHeader = Struct(">BBIB")
+
+
+def _readHeader(header: Struct, mappedFile: mmap.mmap) -> tuple:
+    """
+    Unpack a header straight from a mapped file
+
+    Reads the header at the current position and moves past it, without copying the bytes out of the map first
+
+    Parameters
+    ----------
+
+    header : Struct
+        The compiled format of the header
+    mappedFile : mmap.mmap
+        The mapped file, positioned at the start of the header
 
-        # Work out the frame size. This is just the square root of our chunkSize
-        # For example if a chunk has 4096 items in it, the square root of that is 64, so our size is 64x64
-        frameSize = int(math.sqrt(chunkSize / 3))
+    Returns
+    -------
+    tuple
+        The unpacked values
+    """
 
-        # Now we split the data into lists of chunkSize
-        chunkData =  [data["FileData"][i:i + chunkSize] for i in range(0, len(data["FileData"]), chunkSize)]
+    values = header.unpack_from(mappedFile, mappedFile.tell())
+    mappedFile.seek(header.size, os.SEEK_CUR)
+    return values
 
-        # Loop through all the chunks
-        for chunk in chunkData:
-            # This holds the RGB into as tuples
-            pixelData = []
 
-            # Split the chunk into groups of three (R, G and B)
-            pixelChunks =  [chunk[i:i + 3] for i in range(0, len(chunk) - 1, 3)]
+def _decryptRemaining(cipher, mappedFile: mmap.mmap) -> bytes:
+    """
+    Decrypt the rest of a mapped file
 
-            # Then loop though all the RGB values..
-            for pc in pixelChunks:
-                # ..and make a tuple out of each third
-                pixelData.append((pc[0], pc[1], pc[2]))
+    Passes everything from the current position to the end of the file straight to the cipher as a memoryview.
+    The view is released before returning so that the map can be closed afterwards.
 
-            # Make a new image and put the pixel data in there.
-            img = Image.new("RGB", (frameSize, frameSize))
-            
-            img.putdata(pixelData)
+    Parameters
+    ----------
 
-            # Add this newly created image to our list of images
-            images.append(img)
+    cipher
+        The AES cipher to decrypt with
+    mappedFile : mmap.mmap
+        The mapped file, positioned at the start of the encrypted data
 
-        # And now use the first frame to save all of the subsequent frames as a GIF
-        firstImage = images[0]
-        firstImage.save(outFile, format="GIF", append_images=images,
-               save_all=True, duration=data["Speed"], loop=0)
+    Returns
+    -------
+    bytes
+        The decrypted data
+    """
 
-    except Exception as e:
-        raise e
+    with memoryview(mappedFile)[mappedFile.tell():] as payload:
+        return cipher.decrypt(payload)
 
 
 def _binFileToGIF(file: str, key: str, iv: str, outFile: str):
@@ -2475,110 +4451,104 @@ def _binFileToGIF(file: str, key: str, iv: str, outFile: str):
         Returns an exception if the API or the request returned an error
     
     """
+
+    # These are only needed for decoding Divoom's files, so they're only imported when they're needed
+    from Crypto.Cipher import AES
+    import lzo
     
-    try:
-        with open(file=file, mode="rb") as f:
-
-            fileData = {
-                "Width": 0,
-                "Height": 0,
-                "PicCount": 0,
-                "Speed": 0,
-                "FileData": []
-            }
-
-            # Set up a decryption cipher with our key an IV in CBC mode
-            decrypt_cipher = AES.new(key, AES.MODE_CBC, IV=iv)
-
-            # Get the first byte. This'll be the type of file
-            match f.read(1).hex().upper():
-                # 16x16 static image.
-                # Byte 1 = Image type
-                # Byte 2 ... Byte N = Image data, AES encrypted
-                case "08":
-                    fileData["Width"] = 16
-                    fileData["Height"] = 16
-                    fileData["PicCount"] = 1
-                    fileData["Speed"] = 1
-                    fileData["FileData"] = decrypt_cipher.decrypt(f.read())
-                # 16x16 animated image. Number of frames is byte 2,
-                # Byte 1 = Image type
-                # Byte 2 = Number of frames
-                # Byte 3-4 = Animation speed. See comment below for how to calculate speed
-                # Byte 5 ... Byte N = Image data, AES encrypted
-                case "09":
-                    fileData["Width"] = 16
-                    fileData["Height"] = 16
-                    # Get the number of frames in the file
-                    fileData["PicCount"] = int(f.read(1).hex(), 16)
-                    # Speed is the next two bytes, and is calculated like this:
-                    # (byte 3, bitwise and'd with 255), bitwised or with (byte 2, shifted left by 8 bytes)
-                    speed = f.read(2)
-                    fileData["Speed"] = (speed[1] & 255) | (speed[0] << 8)
-                    # And the rest of the data is AES CBC data
-                    fileData["FileData"] = decrypt_cipher.decrypt(f.read())
-                # Static image, 32x32 or 64x64.
-                # Byte 1 = Image type
-                # Byte 2-3 = Number of rows, number of columns. Size = rows * 16 x cols * 16
-                # Byte 4 = The length of the uncompressed LZO data. 
-                # Byte 5 ... Byte N = Image data, AES encrypted
-                case "11":
-                    # TODO: This breaks the checkerboard image. Fix it!
-                    # Read six bytes, and unpack them into integers.
-                    # dataLength is the length of the LZO uncompressed data. This is different from the length of the unencrypted data!
-                    width, height, dataLength = unpack(">BBI", f.read(6))
-                    # Size = number of rows * 16, number of columns * 16 
-                    fileData["Width"] = width * 16
-                    fileData["Height"] = height * 16
-                    fileData["PicCount"] = 1
-                    # Read and then unencrypt the data. The result is LZO compressed
-                    data = fileData["FileData"] = decrypt_cipher.decrypt(f.read())
-                    # Next, we decompress our data. Byte 4 tells us how much data to read
-                    fileData["FileData"] = lzo.decompress(data[:dataLength], False, ((width * 16) * (height * 16)) * 3)
-                # Animated, 32x32, 64x64 or 128x128 image, static 128x128 images
-                # Byte 1 = Image type
-                # Byte 2 = Number of frames
-                # Byte 3-4 = Speed
-                # Byte 5-6 = Number of rows, number of columns. Size = rows * 16 x cols * 16
-                case "1A":
-                    fileData["PicCount"] = int(f.read(1).hex(), 16)
-                    speed = f.read(2)
-                    fileData["Speed"] = (speed[1] & 255) | (speed[0] << 8)
-                    width, height, unknown, dataLength = unpack(">BBIB", f.read(7))
-                    fileData["Width"] = width * 16
-                    fileData["Height"] = height * 16
-                    f.read(5)
-                    data = fileData["FileData"] = decrypt_cipher.decrypt(f.read())
-                    print(data)
-                    exit()
-                    fileData["FileData"] = f.read()
-                case "1E":
-                    # TODO: find a file that has this type. 
-                    pass
-                case "0C":
-                    # TODO: find a file that has this type
-                    # This file has some kind of scroll mode. Byte 1 is what sort of scroll mode it is. I don't know scrolling means here.
-                    # When you call Cloud/GetFileData, it can return an xScreenCount and yScreenCount, so perhaps that has something
-                    # to do with it? Or, perhaps it's some kind of clock face file that has user defineable 
-                    pass
-                # Font file?
-                case "00":
-                    raise Exception("Filetype not yet supported")
-                    fileData["PicCount"] = int(f.read(1).hex(), 16)
-                    fileData["Speed"] = 1
-                    fileData["FileData"] = f.read()
-                # Other file types, as per the Pixoo APK
-                case "1E" | "0C" | "12" | "OD" | "13" | "07" | "0F" | "16" | "17" | "11" | "00" | "1A": 
-                    # Note: 0F seems to match with a 16x16 file
-                    # Some types also take a string in the decompiled APK. Allows for text to be parsed, like a clock?
-                    raise Exception("Filetype not yet supported")
-                case _:
-                    raise Exception("Unknown File Type")
-            
-            # And then save it as a GIF
-            _imageDataToGIF(fileData, outFile)
-                
-    except ValueError as e:
-        raise e
-    except Exception as e:
-        raise e
\ No newline at end of file
+    # Map the file instead of reading it, so the encrypted data can be handed to the cipher without being copied first
+    with open(file=file, mode="rb") as binFile, mmap.mmap(binFile.fileno(), 0, access=mmap.ACCESS_READ) as f:
+
+        fileData = {
+            "Width": 0,
+            "Height": 0,
+            "PicCount": 0,
+            "Speed": 0,
+            "FileData": []
+        }
+
+        # Set up a decryption cipher with our key an IV in CBC mode
+        decrypt_cipher = AES.new(key, AES.MODE_CBC, IV=iv)
+
+        # Get the first byte. This'll be the type of file
+        match f.read(1).hex().upper():
+            # 16x16 static image.
+            # Byte 1 = Image type
+            # Byte 2 ... Byte N = Image data, AES encrypted
+            case "08":
+                fileData["Width"] = 16
+                fileData["Height"] = 16
+                fileData["PicCount"] = 1
+                fileData["Speed"] = 1
+                fileData["FileData"] = _decryptRemaining(decrypt_cipher, f)
+            # 16x16 animated image. Number of frames is byte 2,
+            # Byte 1 = Image type
+            # Byte 2 = Number of frames
+            # Byte 3-4 = Animation speed. See comment below for how to calculate speed
+            # Byte 5 ... Byte N = Image data, AES encrypted
+            case "09":
+                fileData["Width"] = 16
+                fileData["Height"] = 16
+                # Get the number of frames in the file
+                fileData["PicCount"] = f.read(1)[0]
+                # Speed is the next two bytes, as a big-endian number (byte 3 shifted left by 8 bits, or'd with byte 4)
+                fileData["Speed"] = int.from_bytes(f.read(2), "big")
+                # And the rest of the data is AES CBC data
+                fileData["FileData"] = _decryptRemaining(decrypt_cipher, f)
+            # Static image, 32x32 or 64x64.
+            # Byte 1 = Image type
+            # Byte 2-3 = Number of rows, number of columns. Size = rows * 16 x cols * 16
+            # Byte 4 = The length of the uncompressed LZO data. 
+            # Byte 5 ... Byte N = Image data, AES encrypted
+            case "11":
+                # TODO: This breaks the checkerboard image. Fix it!
+                # Unpack the next six bytes into integers.
+                # dataLength is the length of the LZO uncompressed data. This is different from the length of the unencrypted data!
+                width, height, dataLength = _readHeader(_staticImageHeader, f)
+                # Size = number of rows * 16, number of columns * 16 
+                fileData["Width"] = width * 16
+                fileData["Height"] = height * 16
+                fileData["PicCount"] = 1
+                # Read and then unencrypt the data. The result is LZO compressed
+                data = fileData["FileData"] = _decryptRemaining(decrypt_cipher, f)
+                # Next, we decompress our data. Byte 4 tells us how much data to read
+                fileData["FileData"] = lzo.decompress(data[:dataLength], False, ((width * 16) * (height * 16)) * 3)
+            # Animated, 32x32, 64x64 or 128x128 image, static 128x128 images
+            # Byte 1 = Image type
+            # Byte 2 = Number of frames
+            # Byte 3-4 = Speed
+            # Byte 5-6 = Number of rows, number of columns. Size = rows * 16 x cols * 16
+            case "1A":
+                fileData["PicCount"] = f.read(1)[0]
+                fileData["Speed"] = int.from_bytes(f.read(2), "big")
+                width, height, unknown, dataLength = _readHeader(_animatedImageHeader, f)
+                fileData["Width"] = width * 16
+                fileData["Height"] = height * 16
+                f.read(5)
+                # TODO: The decrypted data isn't decoded into frames yet
+                raise Exception("Filetype not yet supported")
+            case "1E":
+                # TODO: find a file that has this type. 
+                pass
+            case "0C":
+                # TODO: find a file that has this type
+                # This file has some kind of scroll mode. Byte 1 is what sort of scroll mode it is. I don't know scrolling means here.
+                # When you call Cloud/GetFileData, it can return an xScreenCount and yScreenCount, so perhaps that has something
+                # to do with it? Or, perhaps it's some kind of clock face file that has user defineable 
+                pass
+            # Font file?
+            case "00":
+                raise Exception("Filetype not yet supported")
+                fileData["PicCount"] = f.read(1)[0]
+                fileData["Speed"] = 1
+                fileData["FileData"] = f.read()
+            # Other file types, as per the Pixoo APK
+            case "12" | "0D" | "13" | "07" | "0F" | "16" | "17":
+                # Note: 0F seems to match with a 16x16 file
+                # Some types also take a string in the decompiled APK. Allows for text to be parsed, like a clock?
+                raise Exception("Filetype not yet supported")
+            case _:
+                raise Exception("Unknown File Type")
+        
+        # And then save it as a GIF
+        _imageDataToGIF(fileData, outFile)
\ No newline at end of file
@@ -47,12 +47,12 @@ class Colour(NamedTuple):
 # e.g. YYYY-MM-DD, while "PERIOD" are seperated by
 # periods, e.g. YYYY.MM.DD
 class DateFormat(Enum):
-    YYYYMMDDHYPHEN: 0
-    DDMMYYYYHYPHEN: 1
-    MMDDYYYYHYPHEN: 2
-    YYYYMMDDPERIOD: 3
-    DDMMYYYYPERIOD: 4
-    MMDDYYYYPERIOD: 5
+    YYYYMMDDHYPHEN = 0
+    DDMMYYYYHYPHEN = 1
+    MMDDYYYYHYPHEN = 2
+    YYYYMMDDPERIOD = 3
+    DDMMYYYYPERIOD = 4
+    MMDDYYYYPERIOD = 5
 
 # When on the cloud channel, what category of images to show
 class CloudChannelCategory(Enum):
@@ -94,7 +94,7 @@ class GIFData(NamedTuple):
 # The direction of the text (e.g. LTR or RTL)
 class TextDirection(Enum):
     LEFT = 0
-    RIGHT = 0
+    RIGHT = 1
 
 # Dynamic text you can draw to the screen
 class TextType(Enum):
@@ -140,12 +140,14 @@ class TextOptions(NamedTuple):
 
 # Represents a Pixoo device
 class DivoomDevice(dict):
+    __slots__ = () # These are only ever used as dicts, so they don't need a __dict__ of their own
     DeviceName: str # The name of your Pixoo device
     DeviceId: str | int # The ID of your device
     DevicePrivateIP: str # The local IP address of your device
     DeviceMac: str # The MAC address of your device
 
 class DivoomUser(dict):
+    __slots__ = ()
     Token: int # A timestamp showing when you logged in. This must be sent with all online API calls
     UserId: int # Your Divoom user account number. Also used with Divoom online API calls
 
@@ -172,10 +174,27 @@ class Plan(NamedTuple):
 
 # For setting / getting alarms
 class Alarm(dict):
+    __slots__ = ()
     id: int
     name: str
     time: datetime.time | int 
     deviceId: int 
     enabled: bool | int
     imageFileId: str 
-    repeat: list[int]
\ No newline at end of file
+    repeat: list[int]
+
+
+# The night mode schedule, as returned by getNightMode and setNightMode
+class NightMode(dict):
+    __slots__ = ()
+    start: datetime.time | int # When night mode starts
+    end: datetime.time | int # When night mode ends
+    state: bool # Whether night mode is on or off
+    brightness: int # The brightness of the screen during night mode
+
+# Raised when the device or the online API returns an error code
+class PixooAPIError(Exception):
+    def __init__(self, message: str, code: int):
+        super().__init__(f"Error code returned from API: {message} ({code})")
+        self.message = message # The ReturnMessage from the online API, or n/a if there wasn't one
+        self.code = code # The ReturnCode or error_code
@@ -1,3 +1,791 @@
-from ..pixooapi import pixoo 
+import base64
+import datetime
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# TODO: Put tests here
\ No newline at end of file
+import pytest
+
+from pixooapi import pixoo
+
+
+@pytest.fixture
+def pixooDevice(monkeypatch):
+    # Start every test with a device and a user, and nothing left over in the caches from other tests
+    monkeypatch.setattr(pixoo, "device", None)
+    monkeypatch.setattr(pixoo, "_postURL", (None, None))
+    monkeypatch.setattr(pixoo, "user", pixoo.DivoomUser(Token=1, UserId=2))
+    monkeypatch.setattr(pixoo, "_settingsCache", {"ip": None, "ts": 0.0, "data": None})
+    monkeypatch.setattr(pixoo, "_nightModeCache", {"ip": None, "ts": 0.0, "data": None})
+    monkeypatch.setattr(pixoo, "_lastNightMode", None)
+    monkeypatch.setattr(pixoo, "_swrCache", {})
+    monkeypatch.setattr(pixoo, "_swrRefreshing", set())
+    monkeypatch.setattr(pixoo, "_frameCache", OrderedDict())
+
+    pixoo.setDevice({"DevicePrivateIP": "192.168.1.5", "DeviceMac": "", "DeviceId": 1, "DeviceName": "Pixoo64"})
+
+    return pixoo.device
+
+
+@pytest.fixture
+def fakeDevice(monkeypatch):
+    # A local HTTP server that answers /post like the device does, and counts the connections made to it
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            server.connections += 1
+
+        def do_POST(self):
+            server.bodies.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            if server.hangUp:
+                # Like the device does when it's rebooting, hang up without answering
+                self.close_connection = True
+                return
+
+            # Like the device does with connections that have been idle for a while, close it without saying so first
+            drop = server.dropConnections
+            body = json.dumps(server.replies.get(server.bodies[-1].get("Command"), {"error_code": 0})).encode()
+            self.send_response(server.statuses.pop(0) if server.statuses else 200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            self.close_connection = drop
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.connections = 0
+    server.bodies = []
+    server.dropConnections = False
+    server.hangUp = False
+    server.replies = {}
+    server.statuses = []
+    server.hostname = "127.0.0.1:{port}".format(port=server.server_address[1])
+    # Some tests hang up on purpose, so don't print the broken pipes that causes
+    server.handle_error = lambda request, address: None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.setattr(pixoo, "_idleConnections", [])
+
+    yield server
+
+    pixoo.closeSessions()
+    server.shutdown()
+    server.server_close()
+
+
+def test_getSettings_reuses_the_settings_for_settingsTTL(pixooDevice):
+    with mock.patch.object(pixoo, "callPixooAPI", side_effect=lambda **kwargs: {"error_code": 0, "Brightness": 10}) as call:
+        assert pixoo.getSettings() == {"Brightness": 10}
+        assert pixoo.getSettings() == {"Brightness": 10}
+
+    call.assert_called_once()
+
+
+def test_getSettings_without_a_device_says_so(pixooDevice, monkeypatch):
+    monkeypatch.setattr(pixoo, "device", None)
+
+    with pytest.raises(Exception, match="No device has been set up"):
+        pixoo.getSettings()
+
+
+def test_sendGIF_gamma_corrects_local_files(pixooDevice, tmp_path):
+    from PIL import Image
+
+    filename = str(tmp_path / "grey.png")
+    Image.new("RGB", (16, 16), (128, 128, 128)).save(filename)
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"error_code": 0}) as call:
+        pixoo.sendGIF(pixoo.GIFType.LOCALFILE.value, filename)
+        pixoo.sendGIF(pixoo.GIFType.LOCALFILE.value, filename, gamma=2.2)
+
+    frames = [sent.kwargs["data"] for sent in call.call_args_list]
+    pixels = [base64.b64decode(frame["PicData"])[:3] for frame in frames if frame["Command"] == "Draw/SendHttpGif"]
+
+    corrected = round(((128 / 255) ** 2.2) * 255)
+
+    assert pixels == [bytes((128, 128, 128)), bytes((corrected, corrected, corrected))]
+
+
+def test_sendGIF_rejects_gamma_for_files_on_the_device(pixooDevice):
+    with pytest.raises(Exception, match="gamma can only be used"):
+        pixoo.sendGIF(pixoo.GIFType.SDFILE.value, "divoom_gif/1.gif", gamma=2.2)
+
+
+def test_setDevice_accepts_dict_subclasses(pixooDevice):
+    details = OrderedDict(DevicePrivateIP="192.168.1.6", DeviceMac="", DeviceId=2, DeviceName="Pixoo64")
+
+    assert pixoo.setDevice(details) == dict(details)
+    assert isinstance(pixoo.device, pixoo.DivoomDevice)
+
+
+def test_setWhiteBalance_accepts_subclasses(pixooDevice):
+    RGB = namedtuple("RGB", "r g b")
+
+    class HexColour(str):
+        pass
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"error_code": 0}) as call:
+        pixoo.setWhiteBalance(RGB(1, 2, 3))
+        pixoo.setWhiteBalance(HexColour("#040506"))
+        pixoo.setWhiteBalance(OrderedDict(red=7, green=8, blue=9))
+
+    assert [[sent.kwargs["data"][key] for key in ("RValue", "GValue", "BValue")] for sent in call.call_args_list] == \
+        [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+
+
+def test_isValidURL_needs_a_http_or_https_url_with_a_hostname():
+    assert pixoo._isValidURL("http://192.168.1.5/post")
+    assert pixoo._isValidURL("https://appin.divoom-gz.com")
+    assert not pixoo._isValidURL("http:///post")
+    assert not pixoo._isValidURL("ftp://192.168.1.5/post")
+    assert not pixoo._isValidURL("192.168.1.5")
+
+
+def test_sendCommandsFromURL_rejects_invalid_urls(pixooDevice):
+    with mock.patch.object(pixoo, "callPixooAPI") as call:
+        with pytest.raises(Exception, match="not valid"):
+            pixoo.sendCommandsFromURL("file:///etc/passwd")
+
+    call.assert_not_called()
+
+
+def test_getSettings_forceRefresh_asks_the_device_again(pixooDevice):
+    with mock.patch.object(pixoo, "callPixooAPI", side_effect=lambda **kwargs: {"error_code": 0, "Brightness": 10}) as call:
+        pixoo.getSettings()
+        assert pixoo.getSettings(forceRefresh=True) == {"Brightness": 10}
+
+    assert call.call_count == 2
+
+
+def test_swr_serves_stale_values_while_refreshing_them(pixooDevice):
+    fetched = []
+
+    def fetch(forDevice):
+        fetched.append(len(fetched) + 1)
+        return fetched[-1]
+
+    assert pixoo._swr("test", fetch, fresh=0.05) == 1
+    assert pixoo._swr("test", fetch, fresh=0.05) == 1
+    assert fetched == [1]
+
+    # Once it's no longer fresh, the old value comes back straight away while a new one is fetched in the background
+    time.sleep(0.1)
+    assert pixoo._swr("test", fetch, fresh=0.05) == 1
+
+    for _ in range(100):
+        if not pixoo._swrRefreshing:
+            break
+        time.sleep(0.01)
+
+    assert pixoo._swr("test", fetch, fresh=0.05) == 2
+    assert pixoo._swr("test", fetch, fresh=0.05, forceRefresh=True) == 3
+
+    pixoo._swrInvalidate("test")
+    assert pixoo._swr("test", fetch) == 4
+
+
+def test_swr_waits_for_values_older_than_stale(pixooDevice):
+    values = iter((1, 2))
+
+    assert pixoo._swr("test", lambda forDevice: next(values), stale=0.05) == 1
+    time.sleep(0.1)
+    assert pixoo._swr("test", lambda forDevice: next(values), stale=0.05) == 2
+
+
+def test_swr_returns_a_copy_of_the_value(pixooDevice):
+    alarms = pixoo._swr("test", lambda forDevice: [{"AlarmId": 1}])
+    alarms[0]["AlarmId"] = 2
+    alarms.append({"AlarmId": 3})
+
+    assert pixoo._swr("test", lambda forDevice: []) == [{"AlarmId": 1}]
+
+
+def test_swr_refreshes_the_device_it_was_asked_about(pixooDevice):
+    # A GIF ID from a couple of seconds ago, so the next call refreshes it in the background
+    pixoo._swrCache[("getGIFID", "192.168.1.5")] = (time.monotonic() - 2, {"PicId": 1})
+    deviceChanged = threading.Event()
+
+    def respond(data, hostname):
+        deviceChanged.wait(1)
+        return {"PicId": 2}
+
+    with mock.patch.object(pixoo, "callPixooAPI", side_effect=respond) as call:
+        assert pixoo.getGIFID() == {"PicId": 1}
+
+        pixoo.setDevice({"DevicePrivateIP": "192.168.1.6", "DeviceMac": "", "DeviceId": 2, "DeviceName": "Pixoo64"})
+        deviceChanged.set()
+
+        for _ in range(100):
+            if not pixoo._swrRefreshing:
+                break
+            time.sleep(0.01)
+
+    assert call.call_args.kwargs["hostname"] == "192.168.1.5"
+    assert pixoo._swrCache[("getGIFID", "192.168.1.5")][1] == {"PicId": 2}
+
+
+def test_setNightMode_rejects_times_after_midnight(pixooDevice):
+    with mock.patch.object(pixoo, "callPixooAPI") as call:
+        with pytest.raises(ValueError, match="Start"):
+            pixoo.setNightMode(True, 1441, 420)
+        with pytest.raises(ValueError, match="End"):
+            pixoo.setNightMode(True, 1380, 1500)
+
+    call.assert_not_called()
+
+
+def test_setNightMode_accepts_minutes_since_midnight(pixooDevice):
+    schedule = {"ReturnCode": 0, "StartTime": 1380, "EndTime": 420, "OnOff": 1, "Brightness": 10}
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value=schedule) as call:
+        pixoo.setNightMode(True, 1380, 420, 10)
+
+    sent = next(sent.kwargs["data"] for sent in call.call_args_list if sent.kwargs["endpoint"] == "Channel/SetNightView")
+    assert (sent["StartTime"], sent["EndTime"], sent["OnOff"], sent["Brightness"]) == (1380, 420, 1, 10)
+
+
+def test_batch_sends_every_alarm_deletion(pixooDevice):
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"ReturnCode": 0}) as call:
+        with pixoo.batch():
+            pixoo.deleteAlarm(1)
+            pixoo.deleteAlarm(2)
+
+            call.assert_not_called()
+
+    deleted = [sent.kwargs["data"]["AlarmId"] for sent in call.call_args_list if sent.kwargs["endpoint"] == "Alarm/Del"]
+
+    assert sorted(deleted) == [1, 2]
+
+
+def test_batch_only_sends_the_last_change_to_a_setting(pixooDevice):
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"ReturnCode": 0}) as call:
+        with pixoo.batch():
+            pixoo.setNightMode(True, 1380, 420, 10)
+            pixoo.setNightMode(True, 1320, 360, 20)
+
+    call.assert_called_once()
+    assert call.call_args.kwargs["endpoint"] == "Channel/SetNightView"
+    assert call.call_args.kwargs["data"]["StartTime"] == 1320
+    assert call.call_args.kwargs["data"]["Brightness"] == 20
+
+
+def _sentNightModes(call):
+    return [sent for sent in call.call_args_list if sent.kwargs["endpoint"] == "Channel/SetNightView"]
+
+
+def test_setNightMode_skips_a_schedule_it_just_sent(pixooDevice):
+    schedule = {"ReturnCode": 0, "StartTime": 1380, "EndTime": 420, "OnOff": 1, "Brightness": 10}
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value=schedule) as call:
+        pixoo.setNightMode(True, 1380, 420, 10)
+        pixoo.setNightMode(True, 1380, 420, 10)
+
+    assert len(_sentNightModes(call)) == 1
+
+
+def test_setNightMode_sends_a_schedule_again_if_the_batch_failed(pixooDevice):
+    with mock.patch.object(pixoo, "callPixooAPI", side_effect=Exception("Couldn't send")) as call:
+        with pytest.raises(Exception, match="Couldn't send"):
+            with pixoo.batch():
+                pixoo.setNightMode(True, 1380, 420, 10)
+
+    schedule = {"ReturnCode": 0, "StartTime": 1380, "EndTime": 420, "OnOff": 1, "Brightness": 10}
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value=schedule) as call:
+        pixoo.setNightMode(True, 1380, 420, 10)
+
+    assert len(_sentNightModes(call)) == 1
+
+
+def test_getSettings_inside_batch_sees_held_back_changes(pixooDevice, fakeDevice):
+    pixoo.setDevice(dict(pixooDevice, DevicePrivateIP=fakeDevice.hostname))
+    fakeDevice.replies = {"Channel/GetAllConf": {"error_code": 0, "Brightness": 10}}
+
+    with pixoo.batch():
+        assert pixoo.getSettings()["Brightness"] == 10
+
+        pixoo.setBrightness(50)
+        fakeDevice.replies = {"Channel/GetAllConf": {"error_code": 0, "Brightness": 50}}
+
+        assert pixoo.getSettings()["Brightness"] == 50
+
+    assert [body["Command"] for body in fakeDevice.bodies] == ["Channel/GetAllConf", "Channel/SetBrightness", "Channel/GetAllConf"]
+
+
+def test_getSettings_asks_again_once_a_setting_has_changed(pixooDevice, fakeDevice):
+    pixoo.setDevice(dict(pixooDevice, DevicePrivateIP=fakeDevice.hostname))
+    fakeDevice.replies = {"Channel/GetAllConf": {"error_code": 0, "Brightness": 10}, "Channel/SetBrightness": {"error_code": 1}}
+    pixoo.getSettings()
+
+    # The brightness didn't change, so the settings are still up to date
+    with pytest.raises(Exception):
+        pixoo.setBrightness(20)
+
+    fakeDevice.replies = {"Channel/GetAllConf": {"error_code": 0, "Brightness": 20}}
+    assert pixoo.getSettings() == {"Brightness": 10}
+
+    pixoo.setBrightness(20)
+    assert pixoo.getSettings() == {"Brightness": 20}
+
+    assert [body["Command"] for body in fakeDevice.bodies] == \
+        ["Channel/GetAllConf", "Channel/SetBrightness", "Channel/SetBrightness", "Channel/GetAllConf"]
+
+
+def test_batch_sends_held_back_device_commands_in_one_command_list(pixooDevice):
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"error_code": 0}) as call:
+        with pixoo.batch():
+            assert pixoo.setBrightness(10) == 10
+            pixoo.setChannel(pixoo.Channels.CLOUD)
+
+            call.assert_not_called()
+
+    call.assert_called_once()
+    sent = call.call_args.kwargs["data"]
+
+    assert sent["Command"] == "Draw/CommandList"
+    assert [command["Command"] for command in sent["CommandList"]] == ["Channel/SetBrightness", "Channel/SetIndex"]
+
+
+def test_postToDevice_shares_connections_between_threads(fakeDevice):
+    # Each of these threads exits straight after posting, like a background worker might
+    for brightness in range(5):
+        thread = threading.Thread(target=pixoo._postToDevice, args=(fakeDevice.hostname, b'{"Brightness": %d}' % brightness))
+        thread.start()
+        thread.join()
+
+    assert [body["Brightness"] for body in fakeDevice.bodies] == list(range(5))
+    assert fakeDevice.connections == 1
+    assert len(pixoo._idleConnections) == 1
+
+
+def test_postToDevice_keeps_no_more_than_maxIdleConnections(fakeDevice, monkeypatch):
+    monkeypatch.setattr(pixoo, "maxIdleConnections", 1)
+
+    first = pixoo._takeConnection(fakeDevice.hostname)
+    second = pixoo._takeConnection(fakeDevice.hostname)
+    pixoo._returnConnection(fakeDevice.hostname, first)
+    pixoo._returnConnection(fakeDevice.hostname, second)
+
+    assert pixoo._idleConnections == [(fakeDevice.hostname, first)]
+
+
+def test_postToDevice_closes_the_connection_after_a_timeout(fakeDevice):
+    connection = pixoo._takeConnection(fakeDevice.hostname)
+
+    with mock.patch.object(connection, "getresponse", side_effect=TimeoutError):
+        pixoo._returnConnection(fakeDevice.hostname, connection)
+
+        with pytest.raises(pixoo.RequestsTimeout):
+            pixoo._postToDevice(fakeDevice.hostname, b"{}")
+
+    assert connection.sock is None
+    assert pixoo._idleConnections == []
+
+
+def test_postToDevice_reconnects_if_the_device_closed_the_idle_connection(fakeDevice):
+    fakeDevice.dropConnections = True
+    pixoo._postToDevice(fakeDevice.hostname, b"{}")
+    fakeDevice.dropConnections = False
+    # Give the end of the connection time to arrive
+    time.sleep(0.1)
+
+    assert json.loads(pixoo._postToDevice(fakeDevice.hostname, b"{}")) == {"error_code": 0}
+    assert fakeDevice.connections == 2
+    assert len(fakeDevice.bodies) == 2
+
+
+def test_postToDevice_doesnt_send_a_command_twice(fakeDevice):
+    fakeDevice.hangUp = True
+
+    with pytest.raises(pixoo.RequestsConnectionError):
+        pixoo._postToDevice(fakeDevice.hostname, b'{"Command": "Channel/OnOffScreen"}')
+
+    assert len(fakeDevice.bodies) == 1
+    assert pixoo._idleConnections == []
+
+
+def test_callPixooAPI_raises_error_codes_from_the_device(pixooDevice):
+    with mock.patch.object(pixoo, "_postToDevice", return_value=b'{"error_code": 5}'):
+        with pytest.raises(pixoo.PixooAPIError) as error:
+            pixoo.sendCommand(command="Channel/GetAllConf")
+
+    assert (error.value.code, error.value.message) == (5, "n/a")
+
+
+def test_callPixooAPI_raises_return_codes_from_the_online_api(pixooDevice):
+    response = mock.Mock(content=b'{"ReturnCode": 1, "ReturnMessage": "Token is invalid"}')
+
+    with mock.patch.object(pixoo._online_session, "post", return_value=response):
+        with pytest.raises(pixoo.PixooAPIError) as error:
+            pixoo.sendOnlineCommand(command="Alarm/Get")
+
+    assert (error.value.code, error.value.message) == (1, "Token is invalid")
+
+
+def test_commandTemplates_encode_the_same_json_as_the_command():
+    for command, (key, template) in pixoo._commandTemplates.items():
+        data = pixoo.buildCommand(command, **{key: 42})
+
+        assert json.loads(pixoo._encodeJSON(data)) == data
+
+
+def test_getWeather_doesnt_leave_connections_open(pixooDevice, fakeDevice):
+    pixoo.setDevice(dict(pixooDevice, DevicePrivateIP=fakeDevice.hostname))
+    fakeDevice.replies = {
+        "Device/GetWeatherInfo": {"error_code": 0, "Weather": "Sunny", "CurTemp": 20.0},
+        "Channel/GetAllConf": {"error_code": 0, "TemperatureMode": 0}
+    }
+
+    for _ in range(5):
+        pixoo._settingsCache["ts"] = 0.0
+        weather = pixoo.getWeather()
+
+    assert weather == {"Weather": "Sunny", "CurTemp": 20.0, "TemperatureMode": 0}
+    assert len(fakeDevice.bodies) == 10
+    assert fakeDevice.connections <= pixoo.maxIdleConnections
+    assert len(pixoo._idleConnections) == fakeDevice.connections
+
+
+def test_sendBatchCommands_sends_one_request(pixooDevice):
+    with mock.patch.object(pixoo, "_postToDevice", return_value=b'{"error_code": 0}') as post:
+        pixoo.sendBatchCommands([("Channel/SetBrightness", {"Brightness": brightness}) for brightness in range(10)])
+
+    post.assert_called_once()
+
+    hostname, body = post.call_args.args
+    sent = json.loads(body)
+
+    assert hostname == "192.168.1.5"
+    assert sent["Command"] == "Draw/CommandList"
+    assert [command["Brightness"] for command in sent["CommandList"]] == list(range(10))
+
+
+def test_sendBatchCommands_warns_that_port_and_wait_are_ignored(pixooDevice):
+    with mock.patch.object(pixoo, "_postToDevice", return_value=b'{"error_code": 0}') as post:
+        with pytest.warns(DeprecationWarning):
+            pixoo.sendBatchCommands([("Channel/SetBrightness", {"Brightness": 10})], port=8080, wait=True)
+
+    assert post.call_args.args[0] == "192.168.1.5"
+
+
+def test_cachedFileToFrames_keeps_gamma_corrected_frames_separately(pixooDevice, tmp_path):
+    from PIL import Image
+
+    filename = str(tmp_path / "grey.png")
+    Image.new("RGB", (16, 16), (128, 128, 128)).save(filename)
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"error_code": 0}):
+        pixoo.sendGIF(pixoo.GIFType.LOCALFILE.value, filename)
+        pixoo.sendGIF(pixoo.GIFType.LOCALFILE.value, filename, gamma=2.2)
+
+    assert [key[3] for key in pixoo._frameCache] == [None, 2.2]
+
+
+class FrozenDateTime(datetime.datetime):
+    # Like the datetimes freezegun and pendulum make
+    pass
+
+
+def test_setTimer_accepts_subclasses(pixooDevice):
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"error_code": 0}) as call:
+        pixoo.setTimer(FrozenDateTime.now() + datetime.timedelta(minutes=2, seconds=30))
+        pixoo.setTimer(True)
+
+    assert [sent.kwargs["data"]["Minute"] for sent in call.call_args_list] == [2, 0]
+    assert call.call_args.kwargs["data"]["Second"] == 1
+
+
+def test_setAlarm_accepts_subclasses(pixooDevice):
+    class AlarmTime(datetime.time):
+        pass
+
+    when = FrozenDateTime(2026, 1, 1, 7, 30)
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"ReturnCode": 0, "AlarmId": 1}) as call:
+        pixoo.setAlarm(when)
+        pixoo.setAlarm(AlarmTime(7, 30))
+
+    assert call.call_args_list[0].kwargs["data"]["AlarmTime"] == int(when.timestamp())
+    assert datetime.datetime.fromtimestamp(call.call_args_list[1].kwargs["data"]["AlarmTime"]).time() == datetime.time(7, 30)
+
+
+def _sentItems(post):
+    # The text drawText sent in each Draw/SendHttpItemList request
+    return [json.loads(sent.args[1])["ItemList"] for sent in post.call_args_list]
+
+
+def test_drawText_debounce_sends_text_drawn_close_together_at_once(pixooDevice, monkeypatch):
+    monkeypatch.setattr(pixoo, "textDebounce", 0.05)
+    monkeypatch.setattr(pixoo, "_pendingText", {})
+
+    with mock.patch.object(pixoo, "_postToDevice", return_value=b'{"error_code": 0}') as post:
+        pixoo.drawText([{"id": 1, "text": "12"}, {"id": 2, "text": "30"}])
+        pixoo.drawText({"id": 1, "text": "13"})
+        post.assert_not_called()
+
+        for _ in range(100):
+            if post.called:
+                break
+            time.sleep(0.01)
+
+    # Newer text with the same ID replaces the older text
+    assert [[item["TextString"] for item in items] for items in _sentItems(post)] == [["13", "30"]]
+    assert pixoo._pendingTextTimer is None
+
+
+def test_drawText_debounce_sends_straight_away_once_16_are_waiting(pixooDevice, monkeypatch):
+    monkeypatch.setattr(pixoo, "textDebounce", 60)
+    monkeypatch.setattr(pixoo, "_pendingText", {})
+
+    with mock.patch.object(pixoo, "_postToDevice", return_value=b'{"error_code": 0}') as post:
+        pixoo.drawText([{"id": id, "text": str(id)} for id in range(15)])
+        post.assert_not_called()
+
+        pixoo.drawText({"id": 15, "text": "15"})
+
+    assert [len(items) for items in _sentItems(post)] == [16]
+    assert pixoo._pendingTextTimer is None
+
+
+def test_drawText_accepts_TextOptions_and_enums(pixooDevice):
+    options = pixoo.TextOptions(id=1, x=0, y=8, direction=pixoo.TextDirection.RIGHT, font=0, width=64, text="Hi",
+                                colour="#FF0000", update=None, align=pixoo.TextAlignment.CENTER, type=pixoo.TextType.TEXT)
+
+    with mock.patch.object(pixoo, "_postToDevice", return_value=b'{"error_code": 0}') as post:
+        assert pixoo.drawText(options) == [1]
+
+    assert _sentItems(post) == [[{
+        "TextId": 1, "type": pixoo.TextType.TEXT.value, "x": 0, "y": 8, "dir": pixoo.TextDirection.RIGHT.value, "font": 0,
+        "TextWidth": 64, "TextString": "Hi", "color": "#FF0000", "align": 2, "Textheight": 16, "speed": 10
+    }]]
+
+
+def test_drawText_fills_in_defaults_for_dicts(pixooDevice):
+    with mock.patch.object(pixoo, "_postToDevice", return_value=b'{"error_code": 0}') as post:
+        pixoo.drawText([{"id": 1, "text": "Hi", "font": None}])
+
+    [[item]] = _sentItems(post)
+
+    assert item["TextString"] == "Hi"
+    assert item["font"] == 2
+    assert item["dir"] == pixoo.TextDirection.LEFT.value
+
+
+def test_divoomLogin_keeps_logins_in_stateFile(pixooDevice, monkeypatch, tmp_path):
+    import hashlib
+    import os
+    import stat
+
+    stateFile = tmp_path / "state.json"
+    monkeypatch.setattr(pixoo, "stateFile", str(stateFile))
+    monkeypatch.setattr(pixoo, "_loginCache", {})
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"ReturnCode": 0, "Token": 123, "UserId": 456}) as call:
+        assert pixoo.divoomLogin("someone@example.com", "hunter2") == {"Token": 123, "UserId": 456}
+
+    # The file holds the token, so only we can read it, and the email address isn't in it
+    assert stat.S_IMODE(os.stat(stateFile).st_mode) == 0o600
+    assert "someone@example.com" not in stateFile.read_text()
+
+    # The next run of the script doesn't need to log in again
+    pixoo._loginCache.clear()
+
+    with mock.patch.object(pixoo, "callPixooAPI") as call:
+        assert pixoo.divoomLogin("someone@example.com", "hunter2") == {"Token": 123, "UserId": 456}
+
+    call.assert_not_called()
+
+    # Logging out means the saved token can't be used again
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"ReturnCode": 0}):
+        pixoo.divoomLogout(456, 123)
+
+    assert pixoo._loadLogin("someone@example.com", hashlib.md5(b"hunter2").hexdigest()) is None
+
+
+def _framePixels(frame):
+    # The raw [R, G, B, ...] bytes in a GIFData frame
+    return base64.b64decode(frame.data)
+
+
+def test_fileToFrames_pads_frames_that_dont_fill_the_screen(tmp_path):
+    from PIL import Image
+
+    filename = str(tmp_path / "wide.png")
+    Image.new("RGB", (128, 64), (255, 0, 0)).save(filename)
+
+    [frame] = pixoo._fileToFrames(filename)
+    pixels = _framePixels(frame)
+    row = 64 * 3
+
+    assert frame.size == 64
+    assert len(pixels) == 64 * row
+    # The frame is shrunk to 64x32, so the top and bottom 16 rows are black
+    assert pixels[:16 * row] == bytes(16 * row)
+    assert pixels[16 * row:48 * row] == bytes((255, 0, 0)) * 64 * 32
+    assert pixels[48 * row:] == bytes(16 * row)
+
+
+def test_cachedFileToFrames_reuses_frames_until_the_file_changes(pixooDevice, tmp_path):
+    import os
+
+    from PIL import Image
+
+    filename = str(tmp_path / "image.png")
+    Image.new("RGB", (16, 16), (0, 255, 0)).save(filename)
+
+    with mock.patch.object(pixoo, "_fileToFrames", wraps=pixoo._fileToFrames) as convert:
+        first = list(pixoo._cachedFileToFrames(filename, id=0))
+        again = list(pixoo._cachedFileToFrames(filename, id=3))
+
+        assert convert.call_count == 1
+        assert again == [frame._replace(id=3) for frame in first]
+
+        # Once the file has been changed, it's converted again
+        Image.new("RGB", (16, 16), (0, 0, 255)).save(filename)
+        os.utime(filename, ns=(0, os.stat(filename).st_mtime_ns + 1))
+        changed = list(pixoo._cachedFileToFrames(filename))
+
+    assert convert.call_count == 2
+    assert _framePixels(changed[0])[:3] == bytes((0, 0, 255))
+
+
+def test_sessions_retry_when_the_api_is_temporarily_unavailable(fakeDevice):
+    fakeDevice.statuses = [503, 502]
+
+    response = pixoo._createSession().post("http://{hostname}/post".format(hostname=fakeDevice.hostname), data=b"{}")
+
+    assert response.status_code == 200
+    assert len(fakeDevice.bodies) == 3
+
+
+def test_reboot_doesnt_wait_for_the_device_to_answer(pixooDevice):
+    with mock.patch.object(pixoo, "_postToDevice", side_effect=pixoo.RequestsTimeout) as post:
+        assert pixoo.reboot() is True
+
+    assert json.loads(post.call_args.args[1])["Command"] == "Device/SysReboot"
+    assert post.call_args.kwargs["readTimeout"] == 1
+
+
+def test_imageDataToGIF_plays_every_frame_for_the_same_time(tmp_path):
+    from PIL import Image
+
+    outFile = str(tmp_path / "frames.gif")
+    colours = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+    pixoo._imageDataToGIF({"FileData": b"".join(bytes(colour) * 16 * 16 for colour in colours), "PicCount": 3, "Speed": 100}, outFile)
+
+    with Image.open(outFile) as image:
+        frames = []
+
+        for frame in range(image.n_frames):
+            image.seek(frame)
+            frames.append((image.convert("RGB").getpixel((0, 0)), image.info["duration"]))
+
+    # The first frame used to be saved twice, so it played for twice as long
+    assert frames == [(colour, 100) for colour in colours]
+
+
+def test_imageDataToGIF_rejects_empty_image_data(tmp_path):
+    with pytest.raises(Exception, match="No frames in the image data!"):
+        pixoo._imageDataToGIF({"FileData": b"", "PicCount": 1, "Speed": 100}, str(tmp_path / "empty.gif"))
+
+
+def test_getUserImages_returns_a_list_of_images(pixooDevice):
+    fileList = [{"FileId": "group1/M00/1", "FileName": "One", "Date": 1700000000, "LikeCnt": 3},
+                {"FileId": "group1/M00/2", "FileName": "Two"}]
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"ReturnCode": 0, "FileList": fileList}) as call:
+        images = pixoo.getUserImages(123, results=2)
+
+    assert images == [{"FileId": "group1/M00/1", "FileName": "One", "Date": 1700000000},
+                      {"FileId": "group1/M00/2", "FileName": "Two", "Date": None}]
+    assert call.call_args.kwargs["data"] == {"SomeOneUserId": 123, "StartNum": 1, "EndNum": 2}
+
+
+def test_downloadOnlineGIF_saves_the_image_and_returns_its_path(pixooDevice, tmp_path, monkeypatch):
+    from PIL import Image
+
+    fileData = {"ReturnCode": 0, "FileData": [255, 0, 0] * 16 * 16, "PicCount": 1, "Speed": 100, "FileName": "Red"}
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value=fileData):
+        outFile = str(tmp_path / "red.gif")
+        assert pixoo.downloadOnlineGIF("group1/M00/1", outFile) == outFile
+
+        # Without outFile, the name from Divoom is used
+        monkeypatch.chdir(tmp_path)
+        assert pixoo.downloadOnlineGIF("group1/M00/1") == str(tmp_path / "Red")
+
+    with Image.open(outFile) as image:
+        assert image.size == (16, 16)
+        assert image.convert("RGB").getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_downloadOnlineGIF_says_when_an_image_is_private(pixooDevice):
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"ReturnCode": 0, "FileData": []}):
+        with pytest.raises(Exception, match="Image may be set to private"):
+            pixoo.downloadOnlineGIF("group1/M00/1")
+
+
+def test_DateFormat_has_a_member_for_each_format():
+    assert [format.value for format in pixoo.DateFormat] == list(range(6))
+    assert pixoo.DateFormat(3) is pixoo.DateFormat.YYYYMMDDPERIOD
+
+
+def test_TextDirection_right_isnt_an_alias_for_left():
+    assert pixoo.TextDirection.RIGHT is not pixoo.TextDirection.LEFT
+    assert pixoo.TextDirection.RIGHT.value == 1
+
+
+def test_setDateFormat_sends_the_enum_value(pixooDevice):
+    with mock.patch.object(pixoo, "callPixooAPI", return_value={"ReturnCode": 0}) as call:
+        pixoo.setDateFormat(pixoo.DateFormat.MMDDYYYYHYPHEN)
+
+    assert call.call_args.kwargs["endpoint"] == "Sys/SetConf"
+    assert call.call_args.kwargs["data"]["DateFormat"] == 2
+
+
+def test_getNightMode_reuses_the_schedule_until_it_changes(pixooDevice):
+    schedule = {"ReturnCode": 0, "StartTime": 1380, "EndTime": 420, "OnOff": 1, "Brightness": 30}
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value=schedule) as call:
+        assert pixoo.getNightMode() == {"start": datetime.time(23, 0), "end": datetime.time(7, 0), "state": True, "brightness": 30}
+        assert pixoo.getNightMode(asMinutes=True)["start"] == 1380
+        call.assert_called_once()
+
+        # Changing the schedule means it has to be asked for again
+        pixoo.setNightMode(True, 1320, 360, 20)
+        pixoo.getNightMode()
+        assert [sent.kwargs["endpoint"] for sent in call.call_args_list] == \
+            ["Channel/GetNightView", "Channel/SetNightView", "Channel/GetNightView"]
+
+        pixoo.getNightMode(forceRefresh=True)
+        assert call.call_count == 4
+
+
+def test_getNightMode_asks_again_after_nightModeTTL(pixooDevice, monkeypatch):
+    monkeypatch.setattr(pixoo, "nightModeTTL", 0)
+    schedule = {"ReturnCode": 0, "StartTime": 1380, "EndTime": 420, "OnOff": 1, "Brightness": 30}
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value=schedule) as call:
+        pixoo.getNightMode()
+        pixoo.getNightMode()
+
+    assert call.call_count == 2
+
+
+def test_setNightMode_sends_the_schedule_again_after_nightModeTTL(pixooDevice, monkeypatch):
+    monkeypatch.setattr(pixoo, "nightModeTTL", 0)
+    schedule = {"ReturnCode": 0, "StartTime": 1380, "EndTime": 420, "OnOff": 1, "Brightness": 10}
+
+    with mock.patch.object(pixoo, "callPixooAPI", return_value=schedule) as call:
+        pixoo.setNightMode(True, 1380, 420, 10)
+        # It might have been changed in the Divoom app since, so it's sent again
+        pixoo.setNightMode(True, 1380, 420, 10)
+
+    assert len(_sentNightModes(call)) == 2